@@ -0,0 +1,67 @@
+"""
+Gunicorn-Profil für Produktion: ``gunicorn -c gunicorn.conf.py``.
+
+Alle Werte kommen aus Umgebungsvariablen:
+
+GUNICORN_WORKER_CLASS  sync | gthread (Standard) | uvicorn
+GUNICORN_WORKERS       Standard abhängig vom Worker-Typ und der CPU-Anzahl
+GUNICORN_THREADS       Threads pro Worker bei gthread (Standard 4)
+GUNICORN_RELOAD        1 = Code-Reload für Entwicklung (schaltet preload ab)
+
+Reload im Betrieb: ``kill -HUP <master>`` startet die Worker geordnet neu.
+Wegen ``preload_app`` lädt HUP aber keinen neuen Code. Dafür ``kill -USR2 <master>``
+(neuer Master startet parallel), danach ``kill -TERM <alter master>``.
+"""
+import multiprocessing
+import os
+
+cpus = multiprocessing.cpu_count()
+worker_class_name = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class_name == "uvicorn":
+    # Async-Views laufen im Event-Loop; ein Prozess pro Kern reicht
+    worker_class = "uvicorn_worker.UvicornWorker"
+    wsgi_app = "webshop.asgi:application"
+    # Lesende Views laufen dann als async-Views (shop/views_async.py)
+    os.environ.setdefault("ASYNC_VIEWS", "1")
+    default_workers = cpus
+elif worker_class_name == "gthread":
+    # Threads überbrücken Wartezeit auf Datenbank und Redis
+    worker_class = "gthread"
+    wsgi_app = "webshop.wsgi:application"
+    default_workers = cpus + 1
+else:
+    worker_class = "sync"
+    wsgi_app = "webshop.wsgi:application"
+    default_workers = cpus * 2 + 1
+
+workers = int(os.getenv("GUNICORN_WORKERS", default_workers))
+threads = int(os.getenv("GUNICORN_THREADS", 4)) if worker_class == "gthread" else 1
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+backlog = 2048
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Worker nach einer Anzahl Requests erneuern (Speicherlecks), versetzt per Jitter
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+reload = os.getenv("GUNICORN_RELOAD", "0") == "1"
+# Django einmal im Master laden, die Worker erben es per fork (copy-on-write)
+preload_app = not reload
+
+# Heartbeat-Dateien im RAM statt auf dem Container-Dateisystem
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Leerer Wert schaltet das Access-Log ab (z. B. für Benchmarks)
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Verbindungen aus dem Master dürfen nicht zwischen Workern geteilt werden
+    from django.db import connections
+
+    connections.close_all()
@@ -10,9 +10,8 @@ done
 echo "Database is ready!"
 
 
-# Run migrations
+# Run migrations (Migrationen sind eingecheckt, makemigrations gehört nicht in den Start)
 echo "Running database migrations..."
-python manage.py makemigrations --noinput
 python manage.py migrate --noinput
 
 # Create superuser if it doesn't exist
@@ -31,9 +30,9 @@ else:
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
-# Load sample data if database is empty
+# Load sample data (übersprungen, wenn genau dieser Stand schon geladen ist)
 echo "Loading sample data..."
-python manage.py loaddata data.yaml
+python manage.py seed_fixtures data.yaml
 
 echo "Starting server..."
 exec "$@"
\ No newline at end of file
@@ -1,5 +1,238 @@
+"""
+Admin für große Tabellen: Listen laden Fremdschlüssel per JOIN
+(``list_select_related``), zählen bei PostgreSQL ungefiltert nur geschätzt,
+filtern und suchen ausschließlich über indizierte Spalten. Fremdschlüssel
+werden als ID eingegeben (``raw_id_fields``) statt als Select mit allen
+Kunden oder Bestellungen.
+"""
 from django.contrib import admin
-from .models import Customer, Category, Product, Order, OrderItem, Cart, CartItem, Address, Payment
+from django.contrib.admin.utils import get_fields_from_path
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-admin.site.register([Customer, Category, Product, Order, OrderItem, Cart, CartItem, Address, Payment])
+from .models import (
+    Address, Cart, CartItem, Category, Customer, Order, OrderItem, Payment, Product, Shipment, Task,
+)
 
+# Darunter ist COUNT(*) billig genug und die exakte Zahl schöner
+ESTIMATE_THRESHOLD = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Ungefilterte Listen zählen auf PostgreSQL über die Statistik in
+    ``pg_class.reltuples`` statt mit COUNT(*) über die ganze Tabelle.
+    Gefilterte Listen und andere Datenbanken zählen exakt.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        unfiltered = (
+            isinstance(queryset, models.QuerySet) and not queryset.query.where and not queryset.query.distinct
+        )
+        if unfiltered:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1: Tabelle noch nie analysiert
+        return row[0] if row and row[0] >= 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Basis für Tabellen mit Millionen Zeilen. ``search_fields`` werden exakt
+    verglichen (``=``, nutzt den Index) statt mit ``LIKE '%...%'``, Zahlen
+    nur mit Zahlenfeldern.
+    """
+
+    paginator = EstimatedCountPaginator
+    # Sonst zählt die Changelist bei jedem Filter zusätzlich die ganze Tabelle
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ("-id",)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for name in self.search_fields:
+            field = get_fields_from_path(self.model, name)[-1]
+            if isinstance(field, models.IntegerField) and not term.isdigit():
+                continue
+            condition |= Q(**{name: term})
+        return (queryset.filter(condition) if condition else queryset.none()), False
+
+
+class OrderStatusFilter(admin.SimpleListFilter):
+    """Feste Werte statt SELECT DISTINCT status über alle Bestellungen."""
+
+    title = "Status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return [(status, status) for status in Order.STATUSES]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(status=self.value())
+        return queryset
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    # Produkt als Text aus dem JOIN: ein Raw-ID-Widget fragt pro Zeile einzeln ab
+    fields = ("product", "quantity", "price_per_unit")
+    readonly_fields = ("product",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class PaymentInline(admin.StackedInline):
+    model = Payment
+    extra = 0
+    readonly_fields = ("payment_date",)
+
+
+class ShipmentInline(admin.TabularInline):
+    model = Shipment
+    extra = 0
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ("id", "order_date", "customer", "status", "item_count", "subtotal")
+    list_select_related = ("customer",)
+    list_filter = (OrderStatusFilter,)
+    search_fields = ("id", "customer__email")
+    search_help_text = "Bestellnummer oder E-Mail-Adresse des Kunden"
+    raw_id_fields = ("customer", "billing_address", "shipment_address")
+    # Summen pflegen Checkout und Signale
+    readonly_fields = ("order_date", "item_count", "subtotal")
+    inlines = (OrderItemInline, PaymentInline, ShipmentInline)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ("id", "order", "product", "quantity", "price_per_unit")
+    list_select_related = ("order", "product")
+    search_fields = ("order__id", "product__sku")
+    search_help_text = "Bestellnummer oder SKU"
+    raw_id_fields = ("order", "product")
+
+
+@admin.register(Customer)
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ("id", "email", "first_name", "last_name")
+    search_fields = ("id", "email")
+    search_help_text = "Kundennummer oder E-Mail-Adresse"
+    raw_id_fields = ("default_billing_address", "default_shipping_address")
+    readonly_fields = ("password_hash",)
+
+
+@admin.register(Address)
+class AddressAdmin(LargeTableAdmin):
+    list_display = ("id", "customer", "street", "postal_code", "city", "country")
+    list_select_related = ("customer",)
+    search_fields = ("customer__id", "customer__email")
+    search_help_text = "Kundennummer oder E-Mail-Adresse"
+    raw_id_fields = ("customer",)
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ("id", "category_name")
+    search_fields = ("category_name",)
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ("id", "sku", "name", "category", "price", "stock", "updated_at")
+    list_select_related = ("category",)
+    # Wenige Kategorien: die Filterliste ist eine kleine Abfrage, gefiltert wird über den Index
+    list_filter = ("category",)
+    search_fields = ("id", "sku")
+    search_help_text = "Produkt-ID oder SKU"
+    readonly_fields = ("image_formats", "updated_at")
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    # Nur lesend: Summen und Reservierungen pflegt shop/carts.py
+    fields = readonly_fields = ("product", "quantity")
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ("id", "customer", "item_count", "subtotal", "last_updated")
+    list_select_related = ("customer",)
+    search_fields = ("customer__id", "customer__email")
+    search_help_text = "Kundennummer oder E-Mail-Adresse"
+    raw_id_fields = ("customer",)
+    readonly_fields = ("item_count", "subtotal", "last_updated")
+    inlines = (CartItemInline,)
+
+
+@admin.register(CartItem)
+class CartItemAdmin(LargeTableAdmin):
+    list_display = ("id", "cart", "product", "quantity")
+    list_select_related = ("cart", "product")
+    search_fields = ("cart__id", "product__sku")
+    search_help_text = "Warenkorb-ID oder SKU"
+    raw_id_fields = ("cart", "product")
+
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ("id", "order", "amount", "payment_method", "status", "payment_date")
+    list_select_related = ("order",)
+    list_filter = ("payment_method",)
+    search_fields = ("order__id",)
+    search_help_text = "Bestellnummer"
+    raw_id_fields = ("order",)
+
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "locked_by", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("id", "idempotency_key")
+    search_help_text = "Auftrags-ID oder Idempotenz-Schlüssel"
+    readonly_fields = ("locked_by", "locked_at", "created_at", "finished_at", "last_error")
+    actions = ("requeue",)
+
+    @admin.action(description="Erneut einstellen")
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_after=timezone.now(), locked_by="", finished_at=None,
+        )
+        self.message_user(request, f"{count} Aufträge erneut eingestellt.")
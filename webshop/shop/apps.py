@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import order_tasks, product_tasks, signals  # noqa: F401  (Signale und Task-Handler registrieren)
+        from .instrumentation import install_query_recorder
+
+        connection_created.connect(install_query_recorder, dispatch_uid="shop_query_recorder")
@@ -0,0 +1,174 @@
+import copy
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+NAMESPACES = ("catalog", "product", "facets")
+
+# Ausgabe der Befehle, die den Katalog ändern (Import, Seeding, Testdaten)
+PROCESS_LOCAL_WARNING = (
+    "Hinweis: ohne REDIS_URL liegt der Shop-Cache nur in diesem Prozess (LocMemCache). "
+    "Laufende Web-Prozesse sehen Caches und Suchindex erst nach einem Neustart aktuell."
+)
+
+_MISSING = object()
+
+
+class TwoTierCache:
+    """
+    Zweistufiger Cache: ein kleiner LRU-Cache pro Prozess vor dem geteilten
+    Django-Cache (Redis in Produktion, LocMem lokal und in Tests).
+
+    Schlüssel sind nach Namespace getrennt und enthalten dessen Versionsstempel.
+    ``invalidate()`` setzt einen neuen Stempel, damit sind alle alten Einträge
+    in beiden Stufen unerreichbar. Andere Prozesse merken das spätestens nach
+    ``version_ttl`` Sekunden, so lange halten sie den Stempel lokal vor.
+    """
+
+    def __init__(self, alias="default", max_entries=1024, local_ttl=5, version_ttl=2):
+        self.alias = alias
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.version_ttl = version_ttl
+        self._local = OrderedDict()  # key -> (läuft ab, wert)
+        self._versions = {}          # namespace -> (läuft ab, version)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @property
+    def process_local(self):
+        """True, wenn die "geteilte" Stufe nur in diesem Prozess lebt: Invalidierungen erreichen andere nicht."""
+        return isinstance(self.shared, LocMemCache)
+
+    def _version_key(self, namespace):
+        return f"shop:{namespace}:version"
+
+    def _fresh_version(self, namespace):
+        entry = self._versions.get(namespace)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def version(self, namespace):
+        version = self._fresh_version(namespace)
+        if version is not None:
+            return version
+
+        now = time.monotonic()
+        version = self.shared.get(self._version_key(namespace))
+        if version is None:
+            version = uuid.uuid4().hex
+            if not self.shared.add(self._version_key(namespace), version, None):
+                version = self.shared.get(self._version_key(namespace), version)
+        self._versions[namespace] = (now + self.version_ttl, version)
+        return version
+
+    def make_key(self, namespace, key):
+        return f"shop:{namespace}:{self.version(namespace)}:{key}"
+
+    def _local_get(self, full_key):
+        with self._lock:
+            entry = self._local.get(full_key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._local[full_key]
+                return _MISSING
+            self._local.move_to_end(full_key)
+            return entry[1]
+
+    def _local_set(self, full_key, value):
+        with self._lock:
+            self._local[full_key] = (time.monotonic() + self.local_ttl, value)
+            self._local.move_to_end(full_key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, namespace, key, default=None):
+        full_key = self.make_key(namespace, key)
+
+        value = self._local_get(full_key)
+        if value is not _MISSING:
+            self._stats[namespace, "local_hits"] += 1
+            # Kopie, damit Aufrufer den lokalen Eintrag nicht verändern
+            return copy.copy(value)
+
+        value = self.shared.get(full_key, _MISSING)
+        if value is not _MISSING:
+            self._stats[namespace, "shared_hits"] += 1
+            self._local_set(full_key, value)
+            return copy.copy(value)
+
+        self._stats[namespace, "misses"] += 1
+        return default
+
+    def set(self, namespace, key, value, timeout=DEFAULT_TIMEOUT):
+        full_key = self.make_key(namespace, key)
+        self.shared.set(full_key, value, timeout)
+        self._local_set(full_key, value)
+
+    def get_or_set(self, namespace, key, compute, timeout=DEFAULT_TIMEOUT):
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(namespace, key, value, timeout)
+        return value
+
+    async def aget(self, namespace, key, default=None):
+        # Lokale Treffer ohne Thread-Wechsel, alles andere braucht den geteilten Cache
+        version = self._fresh_version(namespace)
+        if version is not None:
+            value = self._local_get(f"shop:{namespace}:{version}:{key}")
+            if value is not _MISSING:
+                self._stats[namespace, "local_hits"] += 1
+                return copy.copy(value)
+        return await sync_to_async(self.get, thread_sensitive=False)(namespace, key, default)
+
+    async def aset(self, namespace, key, value, timeout=DEFAULT_TIMEOUT):
+        await sync_to_async(self.set, thread_sensitive=False)(namespace, key, value, timeout)
+
+    async def aget_or_set(self, namespace, key, compute, timeout=DEFAULT_TIMEOUT):
+        """Wie ``get_or_set``, ``compute`` ist hier eine Coroutine-Funktion."""
+        value = await self.aget(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = await compute()
+            await self.aset(namespace, key, value, timeout)
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            version = uuid.uuid4().hex
+            self.shared.set(self._version_key(namespace), version, None)
+            self._versions[namespace] = (time.monotonic() + self.version_ttl, version)
+
+    def stats(self):
+        """Treffer/Fehlschläge pro Namespace seit Prozessstart."""
+        result = {}
+        for (namespace, kind), count in self._stats.items():
+            result.setdefault(namespace, {"local_hits": 0, "shared_hits": 0, "misses": 0})
+            result[namespace][kind] = count
+        return result
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+            self._versions.clear()
+
+
+shop_cache = TwoTierCache(
+    alias=settings.SHOP_CACHE["ALIAS"],
+    max_entries=settings.SHOP_CACHE["LOCAL_MAX_ENTRIES"],
+    local_ttl=settings.SHOP_CACHE["LOCAL_TTL"],
+    version_ttl=settings.SHOP_CACHE["VERSION_TTL"],
+)
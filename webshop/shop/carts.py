@@ -0,0 +1,133 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cart, CartItem, Product
+from .reservations import hold_many, with_availability
+
+MONEY = models.DecimalField(max_digits=10, decimal_places=2)
+REFRESH_BATCH_SIZE = 1000
+
+
+class CartUpdateError(Exception):
+    """Nichts wurde geändert; ``errors`` beschreibt die Probleme pro Produkt."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Warenkorb wurde nicht geändert.")
+
+
+def reset_summary(cart_id):
+    Cart.objects.filter(id=cart_id).update(
+        item_count=0, subtotal=0, last_updated=timezone.now()
+    )
+
+
+def refresh_summaries(cart_ids, batch_size=REFRESH_BATCH_SIZE):
+    """Artikelanzahl und Zwischensumme aus den Positionen und aktuellen Preisen, per UPDATE mit Subquery."""
+    items = CartItem.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+    line_total = ExpressionWrapper(F("quantity") * F("product__price"), output_field=MONEY)
+    cart_ids = sorted(cart_ids)
+    for start in range(0, len(cart_ids), batch_size):
+        Cart.objects.filter(id__in=cart_ids[start:start + batch_size]).update(
+            item_count=Coalesce(Subquery(items.annotate(total=Sum("quantity")).values("total")), 0),
+            subtotal=Coalesce(
+                Subquery(items.annotate(total=Sum(line_total)).values("total")), Decimal("0"), output_field=MONEY
+            ),
+        )
+
+
+def refresh_for_products(product_ids):
+    """Nach Preisänderungen: Summen aller Warenkörbe, in denen diese Produkte liegen."""
+    refresh_summaries(set(CartItem.objects.filter(product_id__in=product_ids).values_list("cart_id", flat=True)))
+
+
+def cart_items(cart):
+    return list(CartItem.objects.filter(cart=cart).select_related("product").order_by("id"))
+
+
+def summarize(items):
+    """(Artikelanzahl, Zwischensumme) für Positionen mit geladenem Produkt."""
+    return (
+        sum(item.quantity for item in items),
+        sum((item.product.price * item.quantity for item in items), Decimal("0")),
+    )
+
+
+def set_quantities(cart, quantities, relative=False):
+    """
+    Setzt die Mengen ``{product_id: menge}`` in einer Transaktion (0 entfernt
+    die Position), mit ``relative`` werden sie zur aktuellen Menge addiert
+    (unter der Sperre des Warenkorbs, keine verlorenen Änderungen). Bestand
+    und Preise aller Produkte kommen aus einer Abfrage, die die Produkte bis
+    zum Commit sperrt. Positionen und Reservierungen werden per
+    bulk_create/bulk_update geschrieben.
+    Erhöhungen über den verfügbaren Bestand oder unbekannte Produkte lösen
+    CartUpdateError aus, dann bleibt der Warenkorb unverändert.
+    Gibt alle Positionen des Warenkorbs nach der Änderung zurück.
+    """
+    product_ids = sorted(quantities)
+    with transaction.atomic():
+        # Parallele Änderungen desselben Warenkorbs laufen nacheinander
+        list(Cart.objects.select_for_update().filter(id=cart.id).values_list("id"))
+
+        existing = {
+            item.product_id: item
+            for item in CartItem.objects.filter(cart=cart, product_id__in=product_ids)
+        }
+        if relative:
+            quantities = {
+                product_id: max((existing[product_id].quantity if product_id in existing else 0) + delta, 0)
+                for product_id, delta in quantities.items()
+            }
+        # Produkte sperren (nach ID sortiert wie im Checkout): Prüfung und Reservierung
+        # laufen pro Produkt nacheinander, auch über verschiedene Warenkörbe hinweg
+        locked = Product.objects.select_for_update().filter(id__in=product_ids).order_by("id")
+        products = {product.id: product for product in with_availability(locked, exclude_cart=cart)}
+
+        errors = []
+        for product_id in product_ids:
+            product, quantity = products.get(product_id), quantities[product_id]
+            current = existing[product_id].quantity if product_id in existing else 0
+            if product is None:
+                errors.append({"product_id": product_id, "error": "Produkt nicht gefunden."})
+            elif quantity > current and quantity > product.available:
+                # Verringern geht immer, auch wenn der Bestand inzwischen kleiner ist
+                errors.append({
+                    "product_id": product_id,
+                    "error": f"Nicht genug Bestand für {product.name}.",
+                    "available": max(product.available, 0),
+                })
+        if errors:
+            raise CartUpdateError(errors)
+
+        created, updated, removed = [], [], []
+        for product_id in product_ids:
+            quantity, item = quantities[product_id], existing.get(product_id)
+            if item is None:
+                if quantity:
+                    created.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+            elif not quantity:
+                removed.append(item.id)
+            elif quantity != item.quantity:
+                item.quantity = quantity
+                updated.append(item)
+
+        if removed:
+            CartItem.objects.filter(id__in=removed).delete()
+        if updated:
+            CartItem.objects.bulk_update(updated, ["quantity"])
+        if created:
+            CartItem.objects.bulk_create(created)
+        if created or updated:
+            hold_many(created + updated)
+
+        items = cart_items(cart)
+        item_count, subtotal = summarize(items)
+        Cart.objects.filter(id=cart.id).update(
+            item_count=item_count, subtotal=subtotal, last_updated=timezone.now()
+        )
+    return items
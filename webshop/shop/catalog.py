@@ -0,0 +1,85 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import Product
+from .pagination import akeyset_page, keyset_page
+from .reservations import with_availability
+from .search import search_products
+
+PAGE_SIZE = 24
+
+# Sortierung -> (Feld, absteigend)
+SORT_ORDERS = {
+    "name": ("name", False),
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+    "relevance": ("rank", True),
+}
+DEFAULT_SORT = "name"
+
+
+def catalog_filters(params):
+    """Liest die Filter aus den GET-Parametern, so wie product_list sie kennt."""
+    search = (params.get("search") or "").strip() or None
+
+    # Mit Suchbegriff wird standardmäßig nach Relevanz sortiert
+    sort_by = params.get("sort") or ("relevance" if search else DEFAULT_SORT)
+    if sort_by not in SORT_ORDERS or (sort_by == "relevance" and not search):
+        sort_by = DEFAULT_SORT
+    return {
+        "category": params.get("category") or None,
+        "min_price": params.get("min_price") or None,
+        "max_price": params.get("max_price") or None,
+        "search": search,
+        "sort": sort_by,
+    }
+
+
+def filtered_products(filters):
+    products = Product.objects.all()
+
+    # Filter nach Kategorie
+    if filters["category"]:
+        products = products.filter(category_id=filters["category"])
+
+    # Filter nach Preis
+    if filters["min_price"]:
+        products = products.filter(price__gte=filters["min_price"])
+    if filters["max_price"]:
+        products = products.filter(price__lte=filters["max_price"])
+
+    # Volltextsuche über Name und Beschreibung (annotiert "rank")
+    if filters["search"]:
+        products = search_products(products, filters["search"])
+    return products
+
+
+def filter_key(filters):
+    """Normalisierter Schlüssel einer Filterkombination (ohne Sortierung)."""
+    raw = json.dumps({k: v for k, v in filters.items() if k != "sort"}, sort_keys=True)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def catalog_products(products):
+    """Was die Katalogseite pro Produkt braucht: Kategorie (ein JOIN) und Verfügbarkeit."""
+    return with_availability(products.select_related("category"))
+
+
+def product_page(filters, cursor=None, page_size=PAGE_SIZE):
+    """Eine Seite Produkte per Keyset-Paginierung."""
+    field, descending = SORT_ORDERS[filters["sort"]]
+    products = catalog_products(filtered_products(filters))
+    return keyset_page(products, field, descending, cursor, page_size)
+
+
+async def aproduct_page(filters, cursor=None, page_size=PAGE_SIZE):
+    """``product_page`` mit der async ORM-API."""
+    field, descending = SORT_ORDERS[filters["sort"]]
+    if filters["search"]:
+        # Die Suche baut ggf. erst den Index im Prozess auf (synchrone Abfrage)
+        products = await sync_to_async(filtered_products)(filters)
+    else:
+        products = filtered_products(filters)
+    return await akeyset_page(catalog_products(products), field, descending, cursor, page_size)
@@ -0,0 +1,207 @@
+"""
+Import und Export des Produktkatalogs als CSV oder JSON Lines
+(``manage.py import_products`` / ``export_products``).
+
+Der Import liest die Datei in Batches, prüft jede Zeile mit den Modellfeldern
+und schreibt gültige Zeilen per Upsert über die SKU
+(``bulk_create(update_conflicts=True)``). Kategorien werden über eine Map
+Name -> ID im Speicher aufgelöst. Fehlerhafte Zeilen werden mit Zeilennummer
+gemeldet, der Rest wird trotzdem übernommen.
+
+Der Export iteriert mit ``iterator()`` (PostgreSQL: serverseitiger Cursor)
+und hält höchstens einen Batch im Speicher.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from . import carts
+from .caching import NAMESPACES, shop_cache
+from .models import Category, Product
+
+COLUMNS = ("sku", "name", "description", "price", "stock", "category")
+REQUIRED = ("sku", "name", "price", "category")
+FORMATS = ("csv", "jsonl")
+# Bild und Bildformate bleiben beim Aktualisieren unangetastet
+UPDATE_FIELDS = ["name", "description", "price", "stock", "category", "updated_at"]
+BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ImportFileError(Exception):
+    """Die Datei als Ganzes ist unbrauchbar (z.B. Spalten fehlen)."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (Zeile, SKU, Meldung)
+
+    def error(self, line, sku, message):
+        self.errors.append((line, sku, message))
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if str(path).endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_rows(f, fmt):
+    """(Zeilennummer, dict oder None) pro Datensatz, ohne die Datei ganz zu laden."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        missing = [column for column in REQUIRED if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ImportFileError(f"Spalten fehlen: {', '.join(missing)}.")
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def clean_row(row):
+    """Prüft eine Zeile mit den Modellfeldern, wirft ValueError mit allen Meldungen."""
+    cleaned, errors = {}, []
+    for name in ("sku", "name", "description", "price", "stock"):
+        field = Product._meta.get_field(name)
+        value = row.get(name)
+        if name in ("sku", "name", "description"):
+            value = _text(value)
+        elif name == "stock" and _text(value) == "":
+            value = 0
+        try:
+            if name in REQUIRED and _text(value) == "":
+                raise ValidationError("fehlt")
+            cleaned[name] = field.clean(value, None)
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+
+    if cleaned.get("price") is not None and cleaned["price"] < 0:
+        errors.append("price: darf nicht negativ sein")
+    if cleaned.get("stock") is not None and cleaned["stock"] < 0:
+        errors.append("stock: darf nicht negativ sein")
+    # Name der Kategorie mit deren Feld prüfen (max_length), sonst scheitert erst das INSERT am ganzen Batch
+    category = _text(row.get("category"))
+    try:
+        if not category:
+            raise ValidationError("fehlt")
+        cleaned["category"] = Category._meta.get_field("category_name").clean(category, None)
+    except ValidationError as e:
+        errors.append(f"category: {' '.join(e.messages)}")
+    if errors:
+        raise ValueError("; ".join(errors))
+    return cleaned
+
+
+def category_map():
+    # Bei doppelten Namen gewinnt die älteste Kategorie
+    return dict(Category.objects.order_by("-id").values_list("category_name", "id"))
+
+
+def _import_chunk(chunk, categories, result, create_categories, dry_run):
+    rows = {}  # sku -> (Zeile, bereinigte Werte); spätere Zeilen gewinnen
+    for line, row in chunk:
+        if row is None:
+            result.error(line, "", "kein gültiges JSON-Objekt")
+            continue
+        try:
+            cleaned = clean_row(row)
+        except ValueError as e:
+            result.error(line, _text(row.get("sku")), str(e))
+            continue
+        if cleaned["sku"] in rows:
+            result.error(rows[cleaned["sku"]][0], cleaned["sku"], f"SKU doppelt, Zeile {line} gilt")
+        rows[cleaned["sku"]] = (line, cleaned)
+
+    missing = {cleaned["category"] for _, cleaned in rows.values()} - categories.keys()
+    if missing and create_categories and not dry_run:
+        Category.objects.bulk_create([Category(category_name=name) for name in sorted(missing)])
+        categories.update(Category.objects.filter(category_name__in=missing).values_list("category_name", "id"))
+
+    products = []
+    for sku, (line, cleaned) in list(rows.items()):
+        category_id = categories.get(cleaned["category"])
+        if category_id is None and not (create_categories and dry_run):
+            result.error(line, sku, f"category: {cleaned['category']} unbekannt")
+            del rows[sku]
+            continue
+        products.append(Product(
+            sku=sku,
+            name=cleaned["name"],
+            description=cleaned["description"],
+            price=cleaned["price"],
+            stock=cleaned["stock"],
+            category_id=category_id,
+        ))
+    if not products:
+        return
+
+    existing = set(Product.objects.filter(sku__in=rows).values_list("sku", flat=True))
+    if not dry_run:
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products, update_conflicts=True, unique_fields=["sku"], update_fields=UPDATE_FIELDS,
+            )
+            if existing:
+                # Preise evtl. geändert, bulk_create löst das Signal dafür nicht aus
+                carts.refresh_for_products(Product.objects.filter(sku__in=existing).values("id"))
+    result.updated += len(existing)
+    result.created += len(products) - len(existing)
+
+
+def import_products(f, fmt, batch_size=BATCH_SIZE, create_categories=False, dry_run=False):
+    """
+    Importiert die Zeilen aus ``f`` (Textdatei im Format ``fmt``). Jeder Batch
+    ist eine eigene Transaktion, bereits geschriebene Batches bleiben also
+    bestehen, wenn ein späterer scheitert.
+    """
+    result = ImportResult()
+    categories = category_map()
+    rows = read_rows(f, fmt)
+    while chunk := list(islice(rows, batch_size)):
+        _import_chunk(chunk, categories, result, create_categories, dry_run)
+
+    if not dry_run and (result.created or result.updated):
+        # bulk_create löst keine Signale aus: Caches und Suchindex (über den Stempel von "catalog") einmal am Ende
+        shop_cache.invalidate(*NAMESPACES)
+    return result
+
+
+def export_products(out, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Schreibt alle Produkte nach ``out`` und gibt die Anzahl zurück."""
+    rows = (
+        Product.objects.order_by("id")
+        .values_list("sku", "name", "description", "price", "stock", "category__category_name")
+        .iterator(chunk_size=chunk_size)
+    )
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+        return count
+
+    for row in rows:
+        out.write(json.dumps(dict(zip(COLUMNS, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+        count += 1
+    return count
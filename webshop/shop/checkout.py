@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .carts import reset_summary
+from .models import Cart, CartItem, Order, OrderItem, Product
+from .order_tasks import order_jobs
+from .reservations import reserved_quantities
+from .tasks import enqueue
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    def __init__(self):
+        super().__init__("Dein Warenkorb ist leer.")
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, product, requested):
+        self.product = product
+        self.requested = requested
+        super().__init__(f"Nicht genug Bestand für {product.name}.")
+
+
+def place_order(customer, cart, billing_address, shipment_address, payment_method="invoice"):
+    """
+    Legt die Bestellung in einer Transaktion an: Produkte in fester Reihenfolge
+    sperren, Bestand prüfen, OrderItems per bulk_create anlegen, Bestand mit
+    bedingtem F()-Update abbuchen, Warenkorb (inkl. Reservierungen) leeren.
+    Payment, Shipment, Bestätigungsmail und Bestandswarnung laufen als
+    Aufträge der Task-Queue (shop/order_tasks.py).
+    Wirft EmptyCart bzw. InsufficientStock, dann wird nichts gespeichert.
+    """
+    with transaction.atomic():
+        # Erst den Warenkorb, dann die Produkte sperren, in derselben Reihenfolge
+        # wie carts.set_quantities (sonst Deadlock mit gleichzeitigen Änderungen)
+        list(Cart.objects.select_for_update().filter(id=cart.id).values_list("id"))
+        cart_items = list(CartItem.objects.filter(cart=cart).order_by("product_id"))
+        if not cart_items:
+            raise EmptyCart()
+
+        # Sperren nach ID sortiert, damit sich parallele Checkouts nicht verklemmen
+        products = Product.objects.select_for_update().filter(
+            id__in=[item.product_id for item in cart_items]
+        ).order_by("id")
+        products = {product.id: product for product in products}
+
+        # Reservierungen anderer Warenkörbe sind nicht verfügbar
+        reserved = reserved_quantities(products.keys(), exclude_cart=cart)
+        for item in cart_items:
+            product = products[item.product_id]
+            if item.quantity > product.stock - reserved.get(product.id, 0):
+                raise InsufficientStock(product, item.quantity)
+
+        # Summen direkt an der Bestellung speichern
+        order = Order.objects.create(
+            customer=customer,
+            status="pending",
+            billing_address=billing_address,
+            shipment_address=shipment_address,
+            subtotal=sum(products[item.product_id].price * item.quantity for item in cart_items),
+            item_count=sum(item.quantity for item in cart_items),
+        )
+
+        order_items = [
+            OrderItem(
+                order=order,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price_per_unit=products[item.product_id].price,
+            )
+            for item in cart_items
+        ]
+        OrderItem.objects.bulk_create(order_items)
+
+        # Bedingtes Abbuchen: greift nur, wenn der Bestand noch reicht
+        quantities = {item.product_id: item.quantity for item in cart_items}
+        for item in cart_items:
+            updated = Product.objects.filter(
+                id=item.product_id, stock__gte=item.quantity
+            ).update(stock=F("stock") - item.quantity)
+            if not updated:
+                raise InsufficientStock(products[item.product_id], item.quantity)
+
+        low_stock = {
+            product.id for product in products.values()
+            if product.stock - quantities[product.id] <= settings.LOW_STOCK_THRESHOLD < product.stock
+        }
+        enqueue(*order_jobs(order, payment_method, low_stock))
+
+        CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+        reset_summary(cart.id)
+
+    return order
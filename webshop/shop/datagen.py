@@ -0,0 +1,185 @@
+"""
+Synthetische Daten in beliebiger Menge für Last- und Skalierungstests
+(``manage.py generate_data``). Eingefügt wird in Batches: unter PostgreSQL per
+COPY, sonst mit ``bulk_create``. Signale laufen dabei nicht, Caches und
+Suchindex werden am Ende einmal invalidiert.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import NAMESPACES, shop_cache
+from .models import Cart, CartItem, Category, Customer, Order, OrderItem, Product
+
+BATCH_SIZE = 5000
+
+ADJECTIVES = ["Bio", "Klassik", "Premium", "Retro", "Sport", "Urban", "Vintage", "Öko", "Basic", "Limited"]
+NOUNS = ["T-Shirt", "Hoodie", "Cap", "Tasse", "Flasche", "Notizbuch", "Sticker", "Rucksack", "Schal", "Poster"]
+COLORS = ["schwarz", "weiß", "rot", "blau", "grün", "grau", "gelb", "beige"]
+
+
+def _next_id(model):
+    return (model.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+
+def _ids_from(model, first_id):
+    return list(model.objects.filter(id__gte=first_id).order_by("id").values_list("id", flat=True))
+
+
+def bulk_insert(model, fields, rows, batch_size=BATCH_SIZE):
+    """
+    Fügt ``rows`` (Tupel in der Reihenfolge von ``fields``) ein und gibt die
+    neuen IDs in Einfügereihenfolge zurück. PostgreSQL mit psycopg 3 lädt per
+    COPY, alles andere per ``bulk_create``.
+    """
+    first_id = _next_id(model)
+    if connection.vendor == "postgresql":
+        columns = ", ".join(connection.ops.quote_name(model._meta.get_field(f).column) for f in fields)
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            if hasattr(cursor.cursor, "copy"):
+                with cursor.cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                return _ids_from(model, first_id)
+
+    for start in range(0, len(rows), batch_size):
+        model.objects.bulk_create(
+            [model(**dict(zip(fields, row))) for row in rows[start:start + batch_size]],
+            batch_size=batch_size,
+        )
+    return _ids_from(model, first_id)
+
+
+@contextmanager
+def explicit_dates(*fields):
+    # bulk_create überschreibt auto_now/auto_now_add, die Daten sollen aber streuen
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def generate(categories=20, products=10000, customers=1000, carts=300, orders=5000,
+             max_items=5, batch_size=BATCH_SIZE, seed=0, log=lambda message: None):
+    """Erzeugt die angegebenen Mengen zusätzlich zu den vorhandenen Daten."""
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    with transaction.atomic():
+        first = _next_id(Category)
+        category_ids = bulk_insert(
+            Category, ["category_name"], [(f"Kategorie {first + i}",) for i in range(categories)], batch_size
+        )
+        log(f"{len(category_ids)} Kategorien")
+        # Ohne neue Kategorien landen die Produkte in den vorhandenen
+        category_ids = category_ids or list(Category.objects.values_list("id", flat=True))
+
+        first = _next_id(Product)
+        product_rows = []
+        for i in range(products):
+            adjective, noun, color = rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(COLORS)
+            product_rows.append((
+                f"GEN-{first + i}",
+                f"{adjective} {noun} {color} {i}",
+                f"{noun} in {color}, {adjective.lower()} Kollektion.",
+                Decimal(rng.randint(199, 19999)) / 100,
+                rng.randint(0, 100),
+                rng.choice(category_ids),
+                "",
+                "",
+                now,
+            ))
+        with explicit_dates(Product._meta.get_field("updated_at")):
+            product_ids = bulk_insert(
+                Product,
+                ["sku", "name", "description", "price", "stock", "category_id", "image", "image_formats",
+                 "updated_at"],
+                product_rows,
+                batch_size,
+            )
+        prices = dict(zip(product_ids, (row[3] for row in product_rows)))
+        del product_rows
+        log(f"{len(product_ids)} Produkte")
+
+        # Ein Hash für alle, make_password ist absichtlich langsam
+        password_hash = make_password("geheim")
+        first = _next_id(Customer)
+        customer_ids = bulk_insert(
+            Customer,
+            ["first_name", "last_name", "email", "password_hash"],
+            [("Last", f"Test {first + i}", f"last{first + i}@example.test", password_hash) for i in range(customers)],
+            batch_size,
+        )
+        log(f"{len(customer_ids)} Kunden")
+
+        # Warenkörbe mit Summen, höchstens ein Warenkorb pro Kunde
+        cart_lines = []
+        cart_rows = []
+        for customer_id in rng.sample(customer_ids, min(carts, len(customer_ids))):
+            lines = [(product_id, rng.randint(1, 3)) for product_id in rng.sample(product_ids, rng.randint(1, max_items))]
+            cart_lines.append(lines)
+            cart_rows.append((
+                customer_id,
+                sum(quantity for _, quantity in lines),
+                sum(prices[product_id] * quantity for product_id, quantity in lines),
+                now,
+            ))
+        with explicit_dates(Cart._meta.get_field("last_updated")):
+            cart_ids = bulk_insert(Cart, ["customer_id", "item_count", "subtotal", "last_updated"], cart_rows, batch_size)
+        bulk_insert(
+            CartItem,
+            ["cart_id", "product_id", "quantity"],
+            [(cart_id, product_id, quantity) for cart_id, lines in zip(cart_ids, cart_lines) for product_id, quantity in lines],
+            batch_size,
+        )
+        log(f"{len(cart_ids)} Warenkörbe")
+
+        # Bestellungen blockweise, damit die Positionen nicht alle im Speicher liegen
+        order_date = Order._meta.get_field("order_date")
+        created = 0
+        for start in range(0, orders, batch_size):
+            count = min(batch_size, orders - start)
+            order_lines = []
+            order_rows = []
+            for _ in range(count):
+                lines = [(product_id, rng.randint(1, 4)) for product_id in rng.sample(product_ids, rng.randint(1, max_items))]
+                order_lines.append(lines)
+                order_rows.append((
+                    rng.choice(customer_ids),
+                    now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+                    rng.choice(Order.STATUSES),
+                    sum(prices[product_id] * quantity for product_id, quantity in lines),
+                    sum(quantity for _, quantity in lines),
+                ))
+            with explicit_dates(order_date):
+                order_ids = bulk_insert(
+                    Order, ["customer_id", "order_date", "status", "subtotal", "item_count"], order_rows, batch_size
+                )
+            bulk_insert(
+                OrderItem,
+                ["order_id", "product_id", "quantity", "price_per_unit"],
+                [
+                    (order_id, product_id, quantity, prices[product_id])
+                    for order_id, lines in zip(order_ids, order_lines)
+                    for product_id, quantity in lines
+                ],
+                batch_size,
+            )
+            created += len(order_ids)
+            log(f"{created}/{orders} Bestellungen")
+
+    # Ohne Signale: Caches und Suchindex (über den Stempel von "catalog") einmal für alles invalidieren
+    shop_cache.invalidate(*NAMESPACES)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
@@ -0,0 +1,136 @@
+import asyncio
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Min, Q
+
+from .caching import shop_cache
+from .catalog import filter_key, filtered_products
+from .models import Category
+
+FACET_CACHE_TIMEOUT = 60 * 60
+
+# Preisbänder für das Histogramm: (von, bis), "bis" exklusiv
+PRICE_BANDS = [
+    (Decimal("0"), Decimal("10")),
+    (Decimal("10"), Decimal("25")),
+    (Decimal("25"), Decimal("50")),
+    (Decimal("50"), Decimal("100")),
+    (Decimal("100"), None),
+]
+
+
+def _band_q(low, high):
+    q = Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def _price_q(filters):
+    q = Q()
+    if filters["min_price"]:
+        q &= Q(price__gte=filters["min_price"])
+    if filters["max_price"]:
+        q &= Q(price__lte=filters["max_price"])
+    return q
+
+
+def _categories():
+    return Category.objects.order_by("category_name").values_list("id", "category_name")
+
+
+def category_list():
+    """Alle Kategorien als (id, name), gecacht bis sich der Katalog ändert."""
+    return shop_cache.get_or_set(
+        "catalog", "categories", lambda: list(_categories()), FACET_CACHE_TIMEOUT
+    )
+
+
+async def acategory_list():
+    async def compute():
+        return [row async for row in _categories()]
+
+    return await shop_cache.aget_or_set("catalog", "categories", compute, FACET_CACHE_TIMEOUT)
+
+
+def _facet_rows(filters):
+    # Jede Facette ignoriert ihren eigenen Filter: Kategorien werden über alle
+    # Kategorien gezählt, das Preis-Histogramm ohne den Preisfilter.
+    base = filtered_products({**filters, "category": None, "min_price": None, "max_price": None})
+
+    aggregates = {
+        "count": Count("id", filter=_price_q(filters)),
+        "min_price": Min("price"),
+        "max_price": Max("price"),
+    }
+    for i, (low, high) in enumerate(PRICE_BANDS):
+        aggregates[f"band_{i}"] = Count("id", filter=_band_q(low, high))
+
+    return base.order_by().values("category_id").annotate(**aggregates)
+
+
+def _summarize(rows, filters):
+    selected = str(filters["category"]) if filters["category"] else None
+    counts = {row["category_id"]: row["count"] for row in rows}
+    price_rows = [row for row in rows if selected is None or str(row["category_id"]) == selected]
+
+    mins = [row["min_price"] for row in price_rows if row["min_price"] is not None]
+    maxs = [row["max_price"] for row in price_rows if row["max_price"] is not None]
+    bands = [
+        {
+            "min": low,
+            "max": high,
+            # Filter-Obergrenze ist inklusiv (price__lte), das Band exklusiv
+            "filter_max": high - Decimal("0.01") if high is not None else None,
+            "count": sum(row[f"band_{i}"] for row in price_rows),
+        }
+        for i, (low, high) in enumerate(PRICE_BANDS)
+    ]
+
+    return {
+        "counts": counts,
+        "total": sum(row["count"] for row in price_rows),
+        "min_price": min(mins) if mins else None,
+        "max_price": max(maxs) if maxs else None,
+        "price_bands": bands,
+    }
+
+
+def _with_categories(facets, categories):
+    categories = [
+        {"id": pk, "category_name": name, "count": facets["counts"].get(pk, 0)}
+        for pk, name in categories
+    ]
+    return {**facets, "categories": categories}
+
+
+def catalog_facets(filters):
+    """
+    Facetten für die aktuelle Filterkombination: Anzahl pro Kategorie,
+    Preis-Histogramm und Min/Max-Preis aus einer Aggregat-Abfrage.
+    """
+    facets = shop_cache.get_or_set(
+        "facets",
+        filter_key(filters),
+        lambda: _summarize(list(_facet_rows(filters)), filters),
+        FACET_CACHE_TIMEOUT,
+    )
+    return _with_categories(facets, category_list())
+
+
+async def acatalog_facets(filters):
+    """``catalog_facets`` mit der async ORM-API, Facetten und Kategorien parallel."""
+    async def compute():
+        if filters["search"]:
+            # Die Suche baut ggf. erst den Index im Prozess auf (synchrone Abfrage)
+            rows = await sync_to_async(_facet_rows)(filters)
+        else:
+            rows = _facet_rows(filters)
+        return _summarize([row async for row in rows], filters)
+
+    facets, categories = await asyncio.gather(
+        shop_cache.aget_or_set("facets", filter_key(filters), compute, FACET_CACHE_TIMEOUT),
+        acategory_list(),
+    )
+    return _with_categories(facets, categories)
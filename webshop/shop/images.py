@@ -0,0 +1,104 @@
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+# Breiten der Derivate in Pixeln; kleinere Originale werden nicht hochskaliert
+WIDTHS = (320, 640, 960)
+FALLBACK_WIDTH = 640
+
+# (Dateiendung, Pillow-Format, MIME-Type, Speicheroptionen)
+FORMATS = [
+    ("avif", "AVIF", "image/avif", {"quality": 60}),
+    ("webp", "WEBP", "image/webp", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+]
+
+
+def available_formats():
+    """Formate, die das installierte Pillow schreiben kann (AVIF/WebP sind optional)."""
+    return [
+        fmt for fmt in FORMATS
+        if fmt[1] == "JPEG" or features.check(fmt[1].lower())
+    ]
+
+
+def derivative_name(name, width, ext):
+    """products/Cap.png -> products/Cap-640w.webp (neben dem Original)."""
+    stem, _ = posixpath.splitext(name)
+    return f"{stem}-{width}w.{ext}"
+
+
+def derivatives_exist(name, storage=default_storage):
+    return storage.exists(derivative_name(name, WIDTHS[-1], "jpg"))
+
+
+def _flatten(image):
+    # JPEG kennt keine Transparenz: auf weißen Hintergrund legen
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """
+    Erzeugt alle Derivate für die Bilddatei ``name`` und gibt die erzeugten
+    Formate als "avif,webp,jpg" zurück (so wird es an Product gespeichert).
+    Vorhandene Derivate werden nur mit ``force`` neu geschrieben.
+    """
+    formats = available_formats()
+    extensions = ",".join(fmt[0] for fmt in formats)
+    targets = [
+        (width, fmt)
+        for width in WIDTHS
+        for fmt in formats
+        if force or not storage.exists(derivative_name(name, width, fmt[0]))
+    ]
+    if not targets:
+        return extensions
+
+    with storage.open(name, "rb") as f:
+        original = Image.open(f)
+        original.load()
+
+    for width, (ext, pil_format, _, options) in targets:
+        image = original.copy()
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+        if pil_format == "JPEG":
+            image = _flatten(image)
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, **options)
+
+        target = derivative_name(name, width, ext)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buffer.getvalue()))
+    return extensions
+
+
+def image_sources(name, extensions, storage=default_storage):
+    """
+    srcset-fertige Quellen für <picture>: Liste von {"type", "srcset"} in
+    Prioritätsreihenfolge sowie die JPEG-Fallback-URL.
+    """
+    sources = []
+    for ext, _, mime_type, _ in FORMATS:
+        if ext not in extensions:
+            continue
+        srcset = ", ".join(
+            f"{storage.url(derivative_name(name, width, ext))} {width}w" for width in WIDTHS
+        )
+        sources.append({"type": mime_type, "srcset": srcset})
+    fallback = storage.url(derivative_name(name, FALLBACK_WIDTH, "jpg"))
+    return {"sources": sources, "fallback": fallback}
@@ -0,0 +1,330 @@
+"""
+Messung pro Request: SQL-Abfragen (Anzahl, doppelte Statements, DB-Zeit),
+Renderzeit der Templates und Gesamtdauer, gesammelt pro URL-Name.
+
+Die Werte laufen über eine ContextVar. Sie wird von ``sync_to_async`` in den
+Thread der async ORM-Aufrufe mitgenommen, daher funktioniert die Messung für
+synchrone und async Views gleichermaßen.
+"""
+import contextvars
+import logging
+import os
+import socket
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+from .caching import shop_cache
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("shop_request_metrics", default=None)
+
+# Obergrenzen der Histogramm-Buckets für die Request-Dauer (Sekunden)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+WORKERS_KEY = "shop:metrics:workers"
+
+# Transaktionssteuerung wiederholt sich bei jedem atomic() und ist kein N+1
+TRANSACTION_STATEMENTS = ("BEGIN", "COMMIT", "SAVEPOINT", "RELEASE", "ROLLBACK")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+
+    @property
+    def duplicates(self):
+        """Abfragen mit bereits ausgeführtem SQL (gleiches Statement, andere Parameter: N+1)."""
+        return sum(count - 1 for count in self.statements.values())
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+        if not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            metrics.statements[sql] += 1
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """Receiver für ``connection_created``: hängt den Zähler an jede neue Verbindung."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        start, db_time = time.perf_counter(), metrics.db_time
+        try:
+            return self.template.render(context, request)
+        finally:
+            # Lazy Abfragen aus dem Template zählen als DB-Zeit, nicht als Rendern
+            elapsed = time.perf_counter() - start
+            metrics.render_time += elapsed - (metrics.db_time - db_time)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates-Backend, das die Renderzeit pro Request mitschreibt."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+def query_budget(queries, duplicates=None):
+    """
+    Obergrenze für SQL-Abfragen (und optional doppelte Statements) pro Request
+    dieser View, inklusive Session und Kunde. Überschreitungen werden geloggt
+    und gezählt, mit QUERY_BUDGET_STRICT (Tests, DEBUG) schlagen sie fehl.
+    """
+    def decorator(view):
+        view.query_budget = (queries, duplicates)
+        return view
+    return decorator
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _empty_entry():
+    return {
+        "requests": 0, "queries": 0, "duplicates": 0, "max_queries": 0, "over_budget": 0,
+        "db_seconds": 0.0, "render_seconds": 0.0, "duration_seconds": 0.0,
+        "buckets": [0] * len(DURATION_BUCKETS),
+    }
+
+
+def merge_snapshots(snapshots):
+    views, cache_stats = {}, {}
+    for snapshot in snapshots:
+        for view, entry in snapshot["views"].items():
+            total = views.setdefault(view, _empty_entry())
+            for key, value in entry.items():
+                if key == "buckets":
+                    total[key] = [a + b for a, b in zip(total[key], value)]
+                elif key == "max_queries":
+                    total[key] = max(total[key], value)
+                else:
+                    total[key] += value
+        for namespace, counts in snapshot["cache"].items():
+            total = cache_stats.setdefault(namespace, Counter())
+            total.update(counts)
+    return {"views": views, "cache": {ns: dict(counts) for ns, counts in cache_stats.items()}}
+
+
+class MetricsRegistry:
+    """
+    Zähler pro Prozess. Jeder Worker legt alle ``publish_interval`` Sekunden
+    einen Snapshot im geteilten Cache ab, der Metrik-Endpunkt summiert die
+    Snapshots aller Worker. Ohne Redis (LocMem) sieht er nur den eigenen Prozess.
+    """
+
+    def __init__(self, publish_interval=10):
+        self.publish_interval = publish_interval
+        self._views = {}
+        self._lock = threading.Lock()
+        self._published = time.monotonic()
+
+    def observe(self, view, metrics, duration, over_budget=False):
+        with self._lock:
+            entry = self._views.get(view)
+            if entry is None:
+                entry = self._views[view] = _empty_entry()
+            entry["requests"] += 1
+            entry["queries"] += metrics.queries
+            entry["duplicates"] += metrics.duplicates
+            entry["max_queries"] = max(entry["max_queries"], metrics.queries)
+            entry["over_budget"] += over_budget
+            entry["db_seconds"] += metrics.db_time
+            entry["render_seconds"] += metrics.render_time
+            entry["duration_seconds"] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    entry["buckets"][i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            views = {view: {**entry, "buckets": list(entry["buckets"])} for view, entry in self._views.items()}
+        return {"views": views, "cache": shop_cache.stats()}
+
+    def publish_due(self):
+        return self.publish_interval > 0 and time.monotonic() - self._published >= self.publish_interval
+
+    def publish(self):
+        self._published = time.monotonic()
+        shared, worker, now = shop_cache.shared, worker_id(), time.time()
+        ttl = self.publish_interval * 6
+        shared.set(f"shop:metrics:{worker}", self.snapshot(), ttl)
+        # Lesen und Schreiben ohne Sperre: ein verlorener Eintrag kommt beim nächsten Intervall zurück
+        workers = {w: seen for w, seen in shared.get(WORKERS_KEY, {}).items() if now - seen < ttl}
+        workers[worker] = now
+        shared.set(WORKERS_KEY, workers, None)
+
+    def collect(self):
+        """Summe über den eigenen Prozess und die zuletzt veröffentlichten anderen Worker."""
+        shared, own = shop_cache.shared, worker_id()
+        keys = [f"shop:metrics:{w}" for w in shared.get(WORKERS_KEY, {}) if w != own]
+        return merge_snapshots([self.snapshot(), *shared.get_many(keys).values()])
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry(publish_interval=settings.METRICS_PUBLISH_INTERVAL)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(data):
+    """Text-Exposition-Format von Prometheus (Version 0.0.4)."""
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+
+    views = sorted(data["views"].items())
+    for name, key, help_text in (
+        ("shop_requests_total", "requests", "Requests pro View."),
+        ("shop_db_queries_total", "queries", "SQL-Abfragen pro View."),
+        ("shop_db_duplicate_queries_total", "duplicates", "Wiederholte SQL-Statements pro View."),
+        ("shop_db_seconds_total", "db_seconds", "Zeit in SQL-Abfragen pro View."),
+        ("shop_render_seconds_total", "render_seconds", "Renderzeit der Templates pro View."),
+        ("shop_query_budget_exceeded_total", "over_budget", "Requests über dem Query-Budget der View."),
+    ):
+        family(name, "counter", help_text, [("", {"view": view}, entry[key]) for view, entry in views])
+    family("shop_db_queries_max", "gauge", "Höchste Abfragezahl eines Requests pro View.",
+           [("", {"view": view}, entry["max_queries"]) for view, entry in views])
+
+    samples = []
+    for view, entry in views:
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, entry["buckets"]):
+            cumulative += count
+            samples.append(("_bucket", {"view": view, "le": bound}, cumulative))
+        samples.append(("_bucket", {"view": view, "le": "+Inf"}, entry["requests"]))
+        samples.append(("_sum", {"view": view}, entry["duration_seconds"]))
+        samples.append(("_count", {"view": view}, entry["requests"]))
+    family("shop_request_duration_seconds", "histogram", "Dauer der Requests pro View.", samples)
+
+    family("shop_cache_lookups_total", "counter", "Zugriffe auf den Shop-Cache nach Ergebnis.", [
+        ("", {"namespace": namespace, "result": result}, count)
+        for namespace, counts in sorted(data["cache"].items())
+        for result, count in sorted(counts.items())
+    ])
+    return "\n".join(lines) + "\n"
+
+
+class InstrumentationMiddleware:
+    """
+    Misst jeden Request (gehört an den Anfang von MIDDLEWARE, damit Session-
+    und Kundenabfragen mitzählen), setzt ``Server-Timing`` und prüft das
+    Query-Budget der View.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        if registry.publish_due():
+            registry.publish()
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        if registry.publish_due():
+            await sync_to_async(registry.publish, thread_sensitive=False)()
+        return response
+
+    def finish(self, request, response, metrics, duration):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        # Bei Fehlern zählt der Fehler, nicht das Budget (sonst verdeckt es ihn)
+        over_budget = response.status_code < 500 and self.check_budget(view, match, metrics)
+        registry.observe(view, metrics, duration, over_budget)
+
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = (
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries, '
+                f'{metrics.duplicates} duplicate", '
+                f"render;dur={metrics.render_time * 1000:.2f}, "
+                f"total;dur={duration * 1000:.2f}"
+            )
+
+    def check_budget(self, view, match, metrics):
+        budget = getattr(match.func, "query_budget", None) if match else None
+        if budget is None:
+            return False
+        queries, duplicates = budget
+        if metrics.queries <= queries and (duplicates is None or metrics.duplicates <= duplicates):
+            return False
+
+        message = (
+            f"{view}: {metrics.queries} Abfragen ({metrics.duplicates} doppelt), "
+            f"Budget {queries}" + (f" ({duplicates} doppelt)" if duplicates is not None else "")
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            repeated = [sql for sql, count in metrics.statements.most_common(3) if count > 1]
+            raise QueryBudgetExceeded(message + "".join(f"\n  wiederholt: {sql}" for sql in repeated))
+        logger.warning("Query-Budget überschritten: %s", message)
+        return True
+
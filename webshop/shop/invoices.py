@@ -0,0 +1,108 @@
+"""
+Rechnungen als druckfertiges HTML-Dokument, pro Bestellung einmal gerendert
+(Auftrag nach dem Checkout bzw. ``manage.py render_invoices``) und unter
+INVOICE_ROOT/invoices/ abgelegt, außerhalb der öffentlichen Medien.
+
+Der Dateiname ist ein HMAC des Inhalts mit SECRET_KEY: gleicher Inhalt, gleiche
+Datei, und ohne den Schlüssel lässt sich kein Name erraten. Weil sich eine
+Datei nie ändert, darf der Browser sie unbegrenzt cachen (siehe
+views_order.order_invoice_file).
+"""
+import hashlib
+import hmac
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+
+from . import order_tasks
+from .models import Order, OrderItem, Payment, Task, invoice_storage
+
+INVOICE_DIR = "invoices"
+CHUNK_SIZE = 200
+
+
+def invoice_digest(content):
+    return hmac.new(settings.SECRET_KEY.encode(), content, hashlib.sha256).hexdigest()
+
+
+def invoice_name(digest):
+    return f"{INVOICE_DIR}/{digest[:2]}/{digest}.html"
+
+
+def digest_from_name(name):
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def invoice_orders():
+    """Bestellungen mit allem, was die Rechnung braucht: zwei Abfragen für beliebig viele."""
+    return Order.objects.select_related("customer", "billing_address", "shipment_address", "payment").prefetch_related(
+        Prefetch(
+            "orderitem_set",
+            queryset=OrderItem.objects.select_related("product").order_by("id"),
+            to_attr="invoice_items",
+        )
+    )
+
+
+def pending_payment_methods(order_ids):
+    """
+    Zahlungsart aus dem noch nicht erledigten Auftrag ``order.create_payment``
+    (Rechnung vor dem Worker angefordert), ``{order_id: Zahlungsart}``.
+    """
+    keys = {order_tasks.order_key(order_id, "payment"): order_id for order_id in order_ids}
+    if not keys:
+        return {}
+    rows = Task.objects.filter(idempotency_key__in=keys).values_list("idempotency_key", "payload")
+    return {keys[key]: payload.get("payment_method") for key, payload in rows}
+
+
+def render_content(order, payment_method=None):
+    """HTML der Rechnung als Bytes. Enthält nichts Zeitabhängiges, sonst wäre der Hash nicht stabil."""
+    for item in order.invoice_items:
+        item.line_total = item.price_per_unit * item.quantity
+    payment = getattr(order, "payment", None)
+    method = payment.payment_method if payment else payment_method
+    return render_to_string("invoice.html", {
+        "order": order,
+        "number": f"RE-{order.id:06d}",
+        "items": order.invoice_items,
+        "address": order.billing_address or order.shipment_address,
+        "payment_method": dict(Payment.PAYMENT_METHOD_CHOICES).get(method, method),
+    }).encode()
+
+
+def store(content):
+    """Legt den Inhalt unter seinem Hash ab (nur, wenn er noch fehlt) und gibt den Namen zurück."""
+    name, storage = invoice_name(invoice_digest(content)), invoice_storage()
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(content))
+        if saved != name:
+            # Parallel geschrieben: der gleiche Inhalt liegt schon unter name
+            storage.delete(saved)
+    return name
+
+
+def render_invoice(order_id, payment_method=None, force=False):
+    """Rendert die Rechnung einer Bestellung, sofern sie noch keine hat, und gibt den Dateinamen zurück."""
+    order = invoice_orders().get(id=order_id)
+    if order.invoice and not force:
+        return order.invoice.name
+    if payment_method is None and getattr(order, "payment", None) is None:
+        payment_method = pending_payment_methods([order.id]).get(order.id)
+    name = store(render_content(order, payment_method))
+    Order.objects.filter(id=order.id).update(invoice=name)
+    return name
+
+
+def render_chunk(order_ids):
+    """Rendert mehrere Rechnungen (auch im Prozess-Pool), gibt ``{order_id: name}`` zurück."""
+    orders = list(invoice_orders().filter(id__in=order_ids))
+    methods = pending_payment_methods([order.id for order in orders if getattr(order, "payment", None) is None])
+    return {order.id: store(render_content(order, methods.get(order.id))) for order in orders}
+
+
+def save_names(names):
+    Order.objects.bulk_update([Order(id=order_id, invoice=name) for order_id, name in names.items()], ["invoice"])
@@ -0,0 +1,66 @@
+import statistics
+import time
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        "Misst die Latenz von /products/ über den vollständigen WSGI-Handler, "
+        "einmal mit neuer Datenbankverbindung pro Request und einmal mit der "
+        "konfigurierten Wiederverwendung (CONN_MAX_AGE bzw. Pool)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300)
+
+    def handle(self, *args, **options):
+        configured = connection.settings_dict["CONN_MAX_AGE"]
+        if "pool" in connection.settings_dict["OPTIONS"]:
+            # Der Pool lässt sich zur Laufzeit nicht abschalten: zum Vergleich mit DATABASE_POOL=0 laufen lassen
+            modes = [("Pool", 0)]
+        else:
+            max_age = configured or 60
+            modes = [("neu pro Request", 0), (f"CONN_MAX_AGE={max_age}", max_age)]
+
+        handler = WSGIHandler()
+        path = reverse("product_list")
+        # Ohne Seiten-Cache, damit jeder Request die Datenbank braucht
+        with override_settings(PAGE_CACHE_ENABLED=False):
+            for label, max_age in modes:
+                connection.close()
+                connection.settings_dict["CONN_MAX_AGE"] = max_age
+                opened = []
+                counter = lambda sender, **kwargs: opened.append(1)  # noqa: E731
+                connection_created.connect(counter)
+                try:
+                    latencies = self.measure(handler, path, options["requests"])
+                finally:
+                    connection_created.disconnect(counter)
+                self.stdout.write(
+                    f"{label:<20} p50 {statistics.median(latencies):6.2f} ms   "
+                    f"Mittel {statistics.mean(latencies):6.2f} ms   Verbindungen {len(opened)}"
+                )
+        connection.settings_dict["CONN_MAX_AGE"] = configured
+
+    def measure(self, handler, path, count):
+        latencies = []
+        for i in range(count + 1):
+            environ = {
+                "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "",
+                "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+                "wsgi.input": BytesIO(), "wsgi.url_scheme": "http",
+            }
+            start = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            b"".join(response)
+            response.close()  # löst request_finished und damit close_old_connections aus
+            if i:  # erster Request wärmt nur auf
+                latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
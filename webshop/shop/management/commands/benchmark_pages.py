@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from shop.caching import NAMESPACES, shop_cache
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = "Vergleicht den Durchsatz von Katalog und Produktseite mit und ohne Seiten-Cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by("id").first()
+        if product is None:
+            self.stderr.write("Keine Produkte vorhanden, bitte zuerst Daten laden.")
+            return
+
+        urls = [
+            reverse("product_list"),
+            reverse("product_list") + "?sort=price_asc",
+            reverse("product_detail", args=[product.id]),
+        ]
+        for enabled in (False, True):
+            with override_settings(PAGE_CACHE_ENABLED=enabled):
+                # Nur die eigenen Namespaces: der Standard-Cache ist geteilt (Kunden-Stempel, Metriken, andere Apps)
+                shop_cache.invalidate(*NAMESPACES)
+                shop_cache.clear_local()
+                for url in urls:
+                    rate = self.measure(url, options["requests"])
+                    state = "an " if enabled else "aus"
+                    self.stdout.write(f"Cache {state}  {url:<30} {rate:8.1f} req/s")
+
+    def measure(self, url, count):
+        client = Client(HTTP_HOST="localhost")
+        client.get(url)  # Aufwärmen
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get(url)
+        return count / (time.perf_counter() - start)
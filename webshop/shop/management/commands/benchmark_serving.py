@@ -0,0 +1,126 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from shop.models import Customer, Product
+
+# "uvicorn-sync": Uvicorn-Worker mit den synchronen Views (ASYNC_VIEWS=0)
+PROFILES = ("sync", "gthread", "uvicorn", "uvicorn-sync")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Startet Gunicorn nacheinander mit sync-, gthread- und Uvicorn-Workern "
+        "(gunicorn.conf.py) und misst Katalog, Produktseite und Warenkorb unter "
+        "paralleler Last inkl. Latenzverteilung."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+        parser.add_argument("--requests", type=int, default=1000, help="Requests pro Endpunkt")
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--workers", type=int, help="überschreibt GUNICORN_WORKERS")
+
+    def handle(self, *args, **options):
+        customer = Customer.objects.order_by("id").first()
+        product = Product.objects.order_by("id").first()
+        if customer is None or product is None:
+            raise CommandError("Keine Kunden/Produkte vorhanden, bitte zuerst Daten laden.")
+
+        # Eingeloggte Session für den Warenkorb
+        session = SessionStore()
+        session["customer_id"] = customer.id
+        session.create()
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+        endpoints = [
+            ("Katalog", reverse("product_list"), {}),
+            ("Produkt", reverse("product_detail", args=[product.id]), {}),
+            ("Warenkorb", reverse("cart"), {"Cookie": cookie}),
+        ]
+
+        try:
+            for profile in options["profiles"]:
+                port = free_port()
+                server = self.start(profile, port, options["workers"])
+                try:
+                    for label, path, headers in endpoints:
+                        rate, latencies = self.load(port, path, headers, options["requests"], options["concurrency"])
+                        self.stdout.write(f"{profile:<12} {label:<10} {rate:8.1f} req/s   {self.distribution(latencies)}")
+                finally:
+                    server.terminate()
+                    server.wait(timeout=30)
+        finally:
+            session.delete()
+
+    def start(self, profile, port, workers):
+        env = {**os.environ, "GUNICORN_WORKER_CLASS": profile.removesuffix("-sync"),
+               "GUNICORN_BIND": f"127.0.0.1:{port}", "GUNICORN_ACCESSLOG": "", "GUNICORN_RELOAD": "0",
+               "ASYNC_VIEWS": "1" if profile == "uvicorn" else "0"}
+        if workers:
+            env["GUNICORN_WORKERS"] = str(workers)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Gunicorn ({profile}) ist beim Start abgebrochen.")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                return server
+            except OSError:
+                time.sleep(0.1)
+        server.terminate()
+        raise CommandError(f"Gunicorn ({profile}) nicht erreichbar.")
+
+    def load(self, port, path, headers, total, concurrency):
+        headers = {"Host": "localhost", **headers}
+
+        def run(count):
+            # Eine Keep-Alive-Verbindung pro Client
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            latencies = []
+            for _ in range(count):
+                start = time.perf_counter()
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                latencies.append(time.perf_counter() - start)
+                if response.status != 200:
+                    raise CommandError(f"{path}: HTTP {response.status}")
+            connection.close()
+            return latencies
+
+        run(10)  # Aufwärmen
+        per_client = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = [value for chunk in pool.map(run, per_client) for value in chunk]
+        elapsed = time.perf_counter() - start
+
+        return len(latencies) / elapsed, latencies
+
+    def distribution(self, latencies):
+        """p50/p90/p99/max in Millisekunden."""
+        quantiles = statistics.quantiles(latencies, n=100)
+        values = [quantiles[49], quantiles[89], quantiles[98], max(latencies)]
+        return "   ".join(
+            f"{label} {value * 1000:6.1f} ms" for label, value in zip(("p50", "p90", "p99", "max"), values)
+        )
@@ -0,0 +1,70 @@
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from shop.models import Product
+from shop.static_wsgi import StaticFilesApp
+
+CSS = "shop/css/style.css"
+
+
+def not_found(environ, start_response):
+    start_response("404 Not Found", [])
+    return [b""]
+
+
+def call_wsgi(app, path, **extra):
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "HTTP_ACCEPT_ENCODING": "gzip, br", **extra}
+    headers = {}
+
+    def start_response(status, response_headers):
+        headers.update(response_headers)
+
+    body = app(environ, start_response)
+    for _ in body:
+        pass
+    if hasattr(body, "close"):
+        body.close()
+    return headers
+
+
+class Command(BaseCommand):
+    help = "Vergleicht style.css und ein Produktbild: Djangos static-View gegen StaticFilesApp."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Quellverzeichnis statt STATIC_ROOT, damit kein collectstatic nötig ist
+        static_root = finders.find(CSS)[: -len(CSS)]
+        files = [("style.css", settings.STATIC_URL, static_root, CSS)]
+        product = Product.objects.exclude(image="").order_by("id").first()
+        if product is not None:
+            files.append(("Produktbild", settings.MEDIA_URL, settings.MEDIA_ROOT, product.image.name))
+
+        factory = RequestFactory()
+        with override_settings(STATIC_ROOT=static_root):
+            app = StaticFilesApp(not_found)
+            for label, url, root, name in files:
+                path = "/" + url.strip("/") + "/" + name
+                request = factory.get(path, HTTP_ACCEPT_ENCODING="gzip, br")
+                before = self.measure(options["requests"], lambda: b"".join(serve(request, name, document_root=root)))
+                after = self.measure(options["requests"], lambda: call_wsgi(app, path))
+                etag = call_wsgi(app, path)["ETag"]
+                not_modified = self.measure(options["requests"], lambda: call_wsgi(app, path, HTTP_IF_NONE_MATCH=etag))
+                self.stdout.write(
+                    f"{label:<12} Django-View {before:8.1f} req/s   WSGI {after:8.1f} req/s   "
+                    f"304 {not_modified:8.1f} req/s"
+                )
+
+    def measure(self, count, func):
+        func()  # Aufwärmen
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        return count / (time.perf_counter() - start)
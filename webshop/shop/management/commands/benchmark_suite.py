@@ -0,0 +1,164 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.caching import NAMESPACES, shop_cache
+from shop.models import Cart, Category, Customer, Order, OrderItem, Product
+
+MEMORY_SAMPLES = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Wiederholbare Messung von Katalog, Produktseite, Warenkorb und Bestellhistorie: "
+        "p50/p95/p99-Latenz, Abfragen und Speicher pro Request, gespeichert als JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests pro Endpunkt")
+        parser.add_argument("--output", help="JSON-Datei (Standard: benchmarks/<Zeitstempel>.json)")
+        parser.add_argument("--compare", help="früheres Ergebnis, gegen das verglichen wird")
+        parser.add_argument("--label", default="", help="Beschreibung des Laufs")
+        parser.add_argument("--page-cache", action="store_true", help="Seiten-Cache eingeschaltet lassen")
+
+    def handle(self, *args, **options):
+        endpoints = self.endpoints()
+        results = {}
+        with override_settings(PAGE_CACHE_ENABLED=options["page_cache"]):
+            # Nicht cache.clear(): der Standard-Cache gehört nicht dem Benchmark allein
+            shop_cache.invalidate(*NAMESPACES)
+            shop_cache.clear_local()
+            for name, url, customer_id in endpoints:
+                client = Client(HTTP_HOST="localhost")
+                if customer_id:
+                    session = client.session
+                    session["customer_id"] = customer_id
+                    session.save()
+                results[name] = self.measure(client, url, options["requests"])
+                self.stdout.write(self.format_row(name, results[name]))
+
+        report = {"meta": self.meta(options), "endpoints": results}
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / f"{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        self.stdout.write(f"Ergebnis gespeichert: {output}")
+
+        if options["compare"]:
+            self.compare(json.loads(Path(options["compare"]).read_text()), report)
+
+    def endpoints(self):
+        product = Product.objects.order_by("id").first()
+        if product is None:
+            raise CommandError("Keine Produkte vorhanden, bitte zuerst generate_data ausführen.")
+        category = Category.objects.annotate(products=Count("product")).order_by("-products").first()
+        # Die "schwersten" Kunden: größter Warenkorb, meiste Bestellungen
+        cart = Cart.objects.order_by("-item_count").first()
+        orders = Order.objects.values("customer_id").annotate(n=Count("id")).order_by("-n").first()
+
+        catalog = reverse("product_list")
+        endpoints = [
+            ("catalog", catalog, None),
+            ("catalog_price", f"{catalog}?sort=price_asc", None),
+            ("catalog_category", f"{catalog}?category={category.id}&sort=price_desc", None),
+            # Zwei Begriffe wie "Bio Hoodie": typische Suche mit einigen hundert Treffern
+            ("catalog_search", f"{catalog}?search={'+'.join(product.name.split()[:2])}", None),
+            ("product_detail", reverse("product_detail", args=[product.id]), None),
+        ]
+        if cart:
+            endpoints.append(("cart", reverse("cart"), cart.customer_id))
+        if orders:
+            endpoints.append(("orders", reverse("orders_list"), orders["customer_id"]))
+        return endpoints
+
+    def measure(self, client, url, count):
+        response = client.get(url)  # Aufwärmen (Caches, Suchindex)
+        if response.status_code != 200:
+            raise CommandError(f"{url}: HTTP {response.status_code}")
+
+        latencies = []
+        queries = []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                client.get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+
+        # Speicher getrennt messen, tracemalloc verlangsamt die Requests deutlich
+        peaks = []
+        tracemalloc.start()
+        for _ in range(MEMORY_SAMPLES):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            client.get(url)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            "url": url,
+            "requests": count,
+            "p50_ms": round(quantiles[49], 3),
+            "p95_ms": round(quantiles[94], 3),
+            "p99_ms": round(quantiles[98], 3),
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "queries": round(statistics.mean(queries), 2),
+            "max_queries": max(queries),
+            "peak_memory_kib": round(statistics.median(peaks) / 1024, 1),
+            "response_bytes": len(response.content),
+        }
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except OSError:
+            commit = ""
+        return {
+            "label": options["label"],
+            "timestamp": timezone.now().isoformat(),
+            "commit": commit,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "page_cache": options["page_cache"],
+            "volumes": {
+                model.__name__: model.objects.count()
+                for model in (Category, Product, Customer, Cart, Order, OrderItem)
+            },
+        }
+
+    def format_row(self, name, result):
+        return (
+            f"{name:<18} p50 {result['p50_ms']:7.2f} ms   p95 {result['p95_ms']:7.2f} ms   "
+            f"p99 {result['p99_ms']:7.2f} ms   {result['queries']:5.1f} Abfragen   "
+            f"{result['peak_memory_kib']:8.1f} KiB"
+        )
+
+    def compare(self, previous, current):
+        label = previous["meta"].get("label") or previous["meta"]["timestamp"]
+        self.stdout.write(f"\nVergleich mit {label}:")
+        for name, result in current["endpoints"].items():
+            before = previous["endpoints"].get(name)
+            if before is None:
+                continue
+            changes = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "queries", "peak_memory_kib"):
+                if before[key]:
+                    changes.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+6.1f} %")
+            self.stdout.write(f"{name:<18} " + "   ".join(changes))
@@ -0,0 +1,28 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.catalog_io import EXPORT_CHUNK_SIZE, FORMATS, detect_format, export_products
+
+
+class Command(BaseCommand):
+    help = "Exportiert alle Produkte als CSV oder JSON Lines, gestreamt über einen Datenbank-Cursor."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Datei oder - für stdout")
+        parser.add_argument("--format", choices=FORMATS, help="Standard: nach Dateiendung, sonst csv")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"])
+        start = time.perf_counter()
+        if path == "-":
+            # Ohne Abschlussmeldung, die Ausgabe soll direkt weiterverarbeitet werden können
+            export_products(sys.stdout, fmt, options["chunk_size"])
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            count = export_products(f, fmt, options["chunk_size"])
+        self.stdout.write(f"{count} Produkte nach {path} in {time.perf_counter() - start:.1f} s.")
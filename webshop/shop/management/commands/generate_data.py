@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.caching import PROCESS_LOCAL_WARNING, shop_cache
+from shop.datagen import BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Erzeugt synthetische Kategorien, Produkte, Kunden, Warenkörbe und Bestellungen "
+        "in großer Menge (COPY unter PostgreSQL, sonst bulk_create)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--customers", type=int, default=1000)
+        parser.add_argument("--carts", type=int, default=300, help="Kunden mit gefülltem Warenkorb")
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--max-items", type=int, default=5, help="Positionen pro Bestellung/Warenkorb")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--seed", type=int, default=0, help="gleicher Seed, gleiche Daten")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        generate(
+            categories=options["categories"],
+            products=options["products"],
+            customers=options["customers"],
+            carts=options["carts"],
+            orders=options["orders"],
+            max_items=options["max_items"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(f"Fertig in {time.perf_counter() - start:.1f} s.")
+        if shop_cache.process_local:
+            self.stdout.write(self.style.WARNING(PROCESS_LOCAL_WARNING))
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.caching import shop_cache
+from shop.images import generate_derivatives
+from shop.models import Product
+
+
+def _setup_worker():
+    # Bei "spawn"/"forkserver" startet jeder Worker ohne geladenes Django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Erzeugt WebP/AVIF/JPEG-Derivate für alle Produktbilder (parallel)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--force", action="store_true", help="Vorhandene Derivate neu erzeugen."
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Product.objects.exclude(image="").exclude(image__isnull=True)
+            .order_by().values_list("image", flat=True).distinct()
+        )
+        if not names:
+            self.stdout.write("Keine Produktbilder gefunden.")
+            return
+
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=_setup_worker) as pool:
+            futures = {
+                pool.submit(generate_derivatives, name, force=options["force"]): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    formats = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{name}: {e}")
+                    continue
+                Product.objects.filter(image=name).update(
+                    image_formats=formats, updated_at=timezone.now()
+                )
+                self.stdout.write(f"{name}: {formats}")
+
+        if failed < len(names):
+            # update() löst keine Signale aus
+            shop_cache.invalidate("product", "catalog")
+        self.stdout.write(f"{len(names) - failed} von {len(names)} Bild(ern) verarbeitet.")
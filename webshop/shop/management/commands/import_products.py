@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.caching import PROCESS_LOCAL_WARNING, shop_cache
+from shop.catalog_io import BATCH_SIZE, FORMATS, ImportFileError, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Importiert Produkte aus CSV oder JSON Lines (Spalten: sku, name, description, price, "
+        "stock, category). Upsert über die SKU, Kategorien per Name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Datei oder - für stdin")
+        parser.add_argument("--format", choices=FORMATS, help="Standard: nach Dateiendung, sonst csv")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--create-categories", action="store_true", help="unbekannte Kategorien anlegen")
+        parser.add_argument("--dry-run", action="store_true", help="nur prüfen, nichts schreiben")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"])
+        start = time.perf_counter()
+        try:
+            if path == "-":
+                result = self.run(sys.stdin, fmt, options)
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as f:
+                    result = self.run(f, fmt, options)
+        except (ImportFileError, OSError) as e:
+            raise CommandError(str(e))
+
+        for line, sku, message in result.errors:
+            self.stderr.write(f"Zeile {line}" + (f" (SKU {sku})" if sku else "") + f": {message}")
+        self.stdout.write(
+            f"{'Geprüft' if options['dry_run'] else 'Importiert'}: {result.created} neu, "
+            f"{result.updated} aktualisiert, {len(result.errors)} Fehler "
+            f"in {time.perf_counter() - start:.1f} s."
+        )
+        if not options["dry_run"] and (result.created or result.updated) and shop_cache.process_local:
+            self.stdout.write(self.style.WARNING(PROCESS_LOCAL_WARNING))
+
+    def run(self, f, fmt, options):
+        return import_products(
+            f,
+            fmt,
+            batch_size=options["batch_size"],
+            create_categories=options["create_categories"],
+            dry_run=options["dry_run"],
+        )
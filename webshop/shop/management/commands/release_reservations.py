@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.reservations import RELEASE_BATCH_SIZE, release_expired
+
+
+class Command(BaseCommand):
+    help = "Gibt abgelaufene Lagerreservierungen frei (einmalig oder als Sweeper mit --interval)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RELEASE_BATCH_SIZE)
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Sekunden zwischen zwei Durchläufen; 0 = nur einmal ausführen.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired(batch_size=options["batch_size"])
+            self.stdout.write(f"{released} Reservierung(en) freigegeben.")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from shop.invoices import CHUNK_SIZE, render_chunk, save_names
+from shop.models import Order
+
+
+def _setup_worker():
+    # Bei "spawn"/"forkserver" startet jeder Worker ohne geladenes Django
+    django.setup()
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Ungültiges Datum {value}, erwartet JJJJ-MM-TT.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Rendert die Rechnungen aller Bestellungen eines Zeitraums (parallel in einem Prozess-Pool). "
+        "Bestellungen mit Rechnung werden nur mit --force neu gerendert."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=_date, help="erster Tag, JJJJ-MM-TT")
+        parser.add_argument("--to", dest="date_to", type=_date, help="letzter Tag, JJJJ-MM-TT")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--force", action="store_true", help="vorhandene Rechnungen neu rendern")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by("id")
+        if options["date_from"]:
+            orders = orders.filter(order_date__gte=timezone.make_aware(
+                datetime.combine(options["date_from"], datetime.min.time())))
+        if options["date_to"]:
+            orders = orders.filter(order_date__lt=timezone.make_aware(
+                datetime.combine(options["date_to"] + timedelta(days=1), datetime.min.time())))
+        if not options["force"]:
+            orders = orders.filter(invoice="")
+        ids = list(orders.values_list("id", flat=True))
+        if not ids:
+            self.stdout.write("Keine Bestellungen ohne Rechnung im Zeitraum.")
+            return
+
+        start = time.perf_counter()
+        size = options["chunk_size"]
+        chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+        rendered = failed = 0
+        if options["workers"] <= 1:
+            for chunk in chunks:
+                names = render_chunk(chunk)
+                save_names(names)
+                rendered += len(names)
+        else:
+            # Geforkte Worker dürfen die Verbindung des Elternprozesses nicht erben
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=_setup_worker) as pool:
+                futures = {pool.submit(render_chunk, chunk): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    try:
+                        names = future.result()
+                    except Exception as e:
+                        failed += len(futures[future])
+                        self.stderr.write(f"Bestellungen {futures[future][0]}-{futures[future][-1]}: {e}")
+                        continue
+                    save_names(names)
+                    rendered += len(names)
+
+        self.stdout.write(
+            f"{rendered} Rechnungen in {time.perf_counter() - start:.1f} s"
+            + (f", {failed} fehlgeschlagen." if failed else ".")
+        )
@@ -0,0 +1,43 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Arbeitet die Task-Queue ab (Zahlung/Versand anlegen, Mails). Mehrere Threads und "
+        "mehrere Prozesse holen Aufträge parallel per SELECT ... FOR UPDATE SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.TASK_WORKER_CONCURRENCY)
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Sekunden ohne fällige Aufträge")
+        parser.add_argument("--once", action="store_true", help="beenden, sobald nichts mehr fällig ist")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        if connection.vendor == "sqlite" and concurrency > 1:
+            # SQLite sperrt die ganze Datei beim Schreiben, parallele Threads blockieren sich nur
+            self.stderr.write("SQLite: nur ein Thread.")
+            concurrency = 1
+
+        stop = threading.Event()
+        tasks.stop_on_signals(stop)
+        start = time.perf_counter()
+        if not options["once"]:
+            self.stdout.write(f"Worker mit {concurrency} Threads gestartet.")
+        results = tasks.work(
+            concurrency=concurrency,
+            once=options["once"],
+            poll_interval=options["poll_interval"],
+            stop=stop,
+        )
+        self.stdout.write(
+            f"{sum(results.values())} Aufträge in {time.perf_counter() - start:.1f} s "
+            f"({results['done']} erledigt, {results['queued']} erneut eingestellt, {results['failed']} fehlgeschlagen)."
+        )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.caching import PROCESS_LOCAL_WARNING, shop_cache
+from shop.datagen import BATCH_SIZE
+from shop.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Spielt Fixtures idempotent per bulk_create ein (Ersatz für loaddata beim Start). "
+        "Unveränderte Dateien werden anhand ihrer Prüfsumme übersprungen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", nargs="+", help="z.B. data.yaml")
+        parser.add_argument("--force", action="store_true", help="auch bei unveränderter Prüfsumme laden")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        loaded = False
+        for name in options["fixtures"]:
+            start = time.perf_counter()
+            try:
+                counts = seed(name, batch_size=options["batch_size"], force=options["force"])
+            except FileNotFoundError as e:
+                raise CommandError(str(e))
+
+            if counts is None:
+                self.stdout.write(f"{name}: unverändert, übersprungen.")
+                continue
+            loaded = True
+            self.stdout.write(
+                f"{name}: {sum(counts.values())} Objekte in {time.perf_counter() - start:.2f} s "
+                f"({', '.join(f'{label} {count}' for label, count in sorted(counts.items()))})"
+            )
+        if loaded and shop_cache.process_local:
+            self.stdout.write(self.style.WARNING(PROCESS_LOCAL_WARNING))
@@ -0,0 +1,118 @@
+import copy
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import Cart, Customer
+
+MAX_CACHED_CUSTOMERS = 10000
+
+# (customer_id, version) -> (läuft ab, Customer); pro Prozess
+_customers = {}
+_lock = threading.Lock()
+
+
+def _version_key(customer_id):
+    return f"customer:{customer_id}:version"
+
+
+def customer_version(customer_id):
+    return cache.get(_version_key(customer_id), "0")
+
+
+def invalidate_customer(customer_id):
+    """Neuer Versionsstempel, damit kein Prozess mehr die alte Instanz ausliefert."""
+    cache.set(_version_key(customer_id), uuid.uuid4().hex, None)
+
+
+def _prune(now):
+    for key in [key for key, (expires, _) in _customers.items() if expires <= now]:
+        del _customers[key]
+
+
+def resolve_customer(customer_id):
+    key = (int(customer_id), customer_version(customer_id))
+    now = time.monotonic()
+
+    entry = _customers.get(key)
+    if entry and entry[0] > now:
+        return copy.copy(entry[1])
+
+    customer = (
+        Customer.objects.select_related(*settings.CUSTOMER_SELECT_RELATED)
+        .filter(id=customer_id)
+        .first()
+    )
+    if customer is None:
+        return None
+
+    with _lock:
+        if len(_customers) >= MAX_CACHED_CUSTOMERS:
+            _prune(now)
+            if len(_customers) >= MAX_CACHED_CUSTOMERS:
+                _customers.clear()
+        _customers[key] = (now + settings.CUSTOMER_CACHE_TTL, customer)
+    return copy.copy(customer)
+
+
+class CustomerMiddleware:
+    """
+    Stellt ``request.customer`` und ``request.cart`` bereit. Beides wird erst
+    beim ersten Zugriff und höchstens einmal pro Request geladen. Ohne
+    eingeloggten Kunden sind beide falsy, daher ``if not request.customer``
+    statt ``is None`` prüfen.
+
+    Async-Views nutzen ``await request.acustomer()`` (wie ``request.auser()``),
+    das lädt dieselbe Instanz außerhalb des Event-Loops.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.attach(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.attach(request)
+        return await self.get_response(request)
+
+    def attach(self, request):
+        request.customer = SimpleLazyObject(lambda: self.get_customer(request))
+        request.cart = SimpleLazyObject(lambda: self.get_cart(request))
+
+        async def acustomer():
+            await sync_to_async(bool)(request.customer)
+            return request.customer
+
+        request.acustomer = acustomer
+
+    def get_customer(self, request):
+        customer_id = request.session.get("customer_id")
+        if not customer_id:
+            return None
+
+        customer = resolve_customer(customer_id)
+        if customer is None:
+            # Kunde wurde gelöscht: Login-Daten aus der Session entfernen
+            for key in ("customer_id", "customer_name", "cart_items_count"):
+                request.session.pop(key, None)
+        return customer
+
+    def get_cart(self, request):
+        if not request.customer:
+            return None
+        cart, _ = Cart.objects.get_or_create(customer_id=request.customer.id)
+        return cart
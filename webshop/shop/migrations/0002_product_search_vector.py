@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+# Nur PostgreSQL: gepflegte tsvector-Spalte (Generated Column) + GIN-Index.
+# Unter SQLite übernimmt der In-Prozess-Index aus shop/search.py.
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        """
+        ALTER TABLE shop_product ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('german'::regconfig, coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('german'::regconfig, coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    schema_editor.execute(
+        "CREATE INDEX shop_product_search_vector_gin "
+        "ON shop_product USING gin (search_vector)"
+    )
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS shop_product_search_vector_gin")
+    schema_editor.execute("ALTER TABLE shop_product DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_summary(apps, schema_editor):
+    Cart = apps.get_model("shop", "Cart")
+    CartItem = apps.get_model("shop", "CartItem")
+
+    line_total = ExpressionWrapper(
+        F("quantity") * F("product__price"),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    totals = (
+        CartItem.objects.values("cart_id")
+        .annotate(item_count=Sum("quantity"), subtotal=Sum(line_total))
+    )
+    carts = []
+    for row in totals:
+        carts.append(Cart(id=row["cart_id"], item_count=row["item_count"], subtotal=row["subtotal"]))
+    Cart.objects.bulk_update(carts, ["item_count", "subtotal"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:17
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model("shop", "Order")
+    OrderItem = apps.get_model("shop", "OrderItem")
+
+    line_total = ExpressionWrapper(
+        F("quantity") * F("price_per_unit"),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    totals = (
+        OrderItem.objects.values("order_id")
+        .annotate(item_count=Sum("quantity"), subtotal=Sum(line_total))
+    )
+    orders = [
+        Order(id=row["order_id"], item_count=row["item_count"], subtotal=row["subtotal"])
+        for row in totals
+    ]
+    Order.objects.bulk_update(orders, ["item_count", "subtotal"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_cart_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
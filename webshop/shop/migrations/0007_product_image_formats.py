@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_formats',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+    ]
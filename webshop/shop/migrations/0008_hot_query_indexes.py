@@ -0,0 +1,64 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """Doppelte Positionen aus dem alten get_or_create-Rennen zusammenführen."""
+    CartItem = apps.get_model("shop", "CartItem")
+    WishlistItem = apps.get_model("shop", "WishlistItem")
+
+    duplicates = (
+        CartItem.objects.values("cart_id", "product_id")
+        .annotate(rows=Count("id"), keep=Min("id"), quantity=Sum("quantity"))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        CartItem.objects.filter(id=row["keep"]).update(quantity=row["quantity"])
+        CartItem.objects.filter(cart_id=row["cart_id"], product_id=row["product_id"]).exclude(
+            id=row["keep"]
+        ).delete()
+
+    duplicates = (
+        WishlistItem.objects.values("wishlist_id", "product_id")
+        .annotate(rows=Count("id"), keep=Min("id"))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        WishlistItem.objects.filter(wishlist_id=row["wishlist_id"], product_id=row["product_id"]).exclude(
+            id=row["keep"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_image_formats'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-order_date', '-id'], name='shop_order_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='shop_product_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='shop_product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='shop_product_cat_price_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='shop_cartitem_unique_product'),
+        ),
+        migrations.AddConstraint(
+            model_name='wishlistitem',
+            constraint=models.UniqueConstraint(fields=('wishlist', 'product'), name='shop_wishlistitem_unique_product'),
+        ),
+    ]
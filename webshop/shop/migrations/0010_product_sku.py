@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_sku(apps, schema_editor):
+    """Vorhandene Produkte bekommen eine SKU aus ihrer ID (eine UPDATE-Abfrage)."""
+    Product = apps.get_model("shop", "Product")
+    Product.objects.filter(sku__isnull=True).update(
+        sku=Concat(Value("P-"), Cast("id", CharField()))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_fixtureload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_sku, migrations.RunPython.noop),
+    ]
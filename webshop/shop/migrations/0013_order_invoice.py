@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='invoice',
+            field=models.FileField(blank=True, editable=False, upload_to='invoices/'),
+        ),
+    ]
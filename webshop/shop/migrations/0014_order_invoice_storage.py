@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:41
+
+import shop.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_order_invoice'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='invoice',
+            field=models.FileField(blank=True, editable=False, storage=shop.models.invoice_storage, upload_to='invoices/'),
+        ),
+    ]
@@ -1,7 +1,21 @@
-from django.db import models
+from decimal import Decimal
+
+from django.core.files.storage import storages
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from . import images
+from .caching import shop_cache
 from django.contrib.auth.hashers import make_password, check_password
 
 
+def invoice_storage():
+    # Aufruf statt Instanz: die Migration verweist auf die Funktion, nicht auf einen Pfad
+    return storages["invoices"]
+
+
 class Customer(models.Model):
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
@@ -41,12 +55,42 @@ class Category(models.Model):
 
 
 class Product(models.Model):
+    # Natürlicher Schlüssel für Import/Export (shop/catalog_io.py)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField()
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     image = models.ImageField(upload_to="products/", null=True, blank=True)
+    # Erzeugte Bildformate, z.B. "avif,webp,jpg" (siehe shop/images.py)
+    image_formats = models.CharField(max_length=50, blank=True, editable=False)
+    # db_default, damit auch Fixtures (raw save, ohne auto_now) einen Wert bekommen
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
+
+    def image_sources(self):
+        """srcset-Quellen der Derivate oder None, solange keine erzeugt wurden."""
+        if not self.image or not self.image_formats:
+            return None
+        return images.image_sources(self.image.name, self.image_formats.split(","))
+
+    def generate_image_derivatives(self, force=False):
+        formats = images.generate_derivatives(self.image.name, force=force)
+        # update() statt save(): keine Signale, aber updated_at für die Karten-Fragmente
+        Product.objects.filter(image=self.image.name).update(
+            image_formats=formats, updated_at=timezone.now()
+        )
+        # Ohne Signale: gecachte Produkte und Seiten kennen die Derivate sonst nicht
+        transaction.on_commit(lambda: shop_cache.invalidate("product", "catalog"))
+        self.image_formats = formats
+
+    class Meta:
+        # Keyset-Sortierungen des Katalogs (Feld, id), mit Kategorie-Filter nach Preis
+        indexes = [
+            models.Index(fields=["name", "id"], name="shop_product_name_idx"),
+            models.Index(fields=["price", "id"], name="shop_product_price_idx"),
+            models.Index(fields=["category", "price", "id"], name="shop_product_cat_price_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -82,10 +126,39 @@ class Order(models.Model):
     )
 
     order_date = models.DateTimeField(auto_now_add=True)
+    # Feste Werte (Checkout, Admin-Filter, Testdaten), bewusst ohne choices am Feld
+    STATUSES = ("pending", "processing", "shipped", "delivered", "completed", "cancelled")
     status = models.CharField(max_length=50)
 
+    # Beim Checkout gesetzt, bei Änderungen an OrderItems neu berechnet (signals.py)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.IntegerField(default=0)
+
+    # Bestätigungsmail verschickt (order_tasks.send_confirmation), verhindert doppelte Mails
+    confirmation_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Gerenderte Rechnung, inhaltsadressiert unter INVOICE_ROOT/invoices/ (shop/invoices.py)
+    invoice = models.FileField(upload_to="invoices/", storage=invoice_storage, blank=True, editable=False)
+
     def get_total_amount(self):
-        return sum(item.price_per_unit * item.quantity for item in self.orderitem_set.all())
+        return self.subtotal
+
+    def recalculate_totals(self):
+        line_total = ExpressionWrapper(
+            F("quantity") * F("price_per_unit"),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        totals = self.orderitem_set.aggregate(item_count=Sum("quantity"), subtotal=Sum(line_total))
+        self.item_count = totals["item_count"] or 0
+        self.subtotal = totals["subtotal"] or Decimal("0")
+        Order.objects.filter(id=self.id).update(item_count=self.item_count, subtotal=self.subtotal)
+
+    class Meta:
+        # Bestellhistorie: neueste zuerst, Keyset über (order_date, id); Statusfilter im Admin
+        indexes = [
+            models.Index(fields=["customer", "-order_date", "-id"], name="shop_order_customer_date_idx"),
+            models.Index(fields=["status", "-id"], name="shop_order_status_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id}"
@@ -102,12 +175,35 @@ class Cart(models.Model):
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE)
     last_updated = models.DateTimeField(auto_now=True)
 
+    # Denormalisiert, wird über shop/carts.py mit F()-Ausdrücken gepflegt
+    item_count = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
 
+    class Meta:
+        # Eine Position pro Produkt; get_or_create fängt den Konflikt paralleler Requests ab
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="shop_cartitem_unique_product"),
+        ]
+
+
+class StockReservation(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
+    cart_item = models.OneToOneField(CartItem, on_delete=models.CASCADE, related_name="reservation")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "expires_at"], name="shop_reservation_active_idx"),
+        ]
+
 
 class Wishlist(models.Model):
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE)
@@ -118,6 +214,11 @@ class WishlistItem(models.Model):
     wishlist = models.ForeignKey(Wishlist, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["wishlist", "product"], name="shop_wishlistitem_unique_product"),
+        ]
+
 
 class Payment(models.Model):
     PAYMENT_METHOD_CHOICES = [
@@ -138,3 +239,40 @@ class Shipment(models.Model):
     carrier = models.CharField(max_length=100, blank=True)
     tracking_number = models.CharField(max_length=200, blank=True)
     status = models.CharField(max_length=50, blank=True)
+
+
+class FixtureLoad(models.Model):
+    """Zuletzt eingespielter Stand einer Fixture (seed_fixtures überspringt gleiche Prüfsummen)."""
+    name = models.CharField(max_length=255, unique=True)
+    checksum = models.CharField(max_length=64)
+    loaded_at = models.DateTimeField(auto_now=True)
+
+
+class Task(models.Model):
+    """Auftrag der Task-Queue (shop/tasks.py), abgearbeitet von ``manage.py run_tasks``."""
+    QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+    STATUS_CHOICES = [(QUEUED, "Wartend"), (RUNNING, "Läuft"), (DONE, "Erledigt"), (FAILED, "Fehlgeschlagen")]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Gleicher Schlüssel, gleicher Auftrag: erneutes Einstellen ist wirkungslos
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Teilindizes: nur offene bzw. laufende Aufträge, erledigte blähen sie nicht auf
+        indexes = [
+            models.Index(fields=["run_after", "id"], name="shop_task_due_idx", condition=Q(status="queued")),
+            models.Index(fields=["locked_at"], name="shop_task_running_idx", condition=Q(status="running")),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id}"
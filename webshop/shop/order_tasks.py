@@ -0,0 +1,79 @@
+"""
+Nebenwirkungen einer Bestellung, von place_order in derselben Transaktion
+eingestellt (shop/tasks.py). Alle Handler sind idempotent.
+"""
+from django.conf import settings
+from django.core.mail import mail_admins, send_mail
+from django.utils import timezone
+
+from . import invoices
+from .models import Order, Payment, Product, Shipment
+from .tasks import job, task
+
+
+@task("order.create_payment")
+def create_payment(order_id, payment_method):
+    order = Order.objects.get(id=order_id)
+    Payment.objects.get_or_create(
+        order=order,
+        defaults={"amount": order.subtotal, "payment_method": payment_method, "status": "pending"},
+    )
+
+
+@task("order.create_shipment")
+def create_shipment(order_id):
+    if not Shipment.objects.filter(order_id=order_id).exists():
+        Shipment.objects.create(order_id=order_id, status="pending")
+
+
+@task("order.send_confirmation")
+def send_confirmation(order_id):
+    # Erst markieren, dann senden: das bedingte UPDATE sperrt die Zeile, ein zweiter
+    # Lauf (erneut eingestellt, abgelaufene Sperre) findet die Markierung und sendet nicht.
+    # Schlägt der Versand fehl, rollt der Auftrag die Markierung zurück.
+    if not Order.objects.filter(id=order_id, confirmation_sent_at__isnull=True).update(
+        confirmation_sent_at=timezone.now()
+    ):
+        return
+    order = Order.objects.select_related("customer").get(id=order_id)
+    send_mail(
+        f"Deine Bestellung #{order.id}",
+        f"Hallo {order.customer.first_name},\n\n"
+        f"danke für deine Bestellung #{order.id} ({order.item_count} Artikel, {order.subtotal} €).\n",
+        None,
+        [order.customer.email],
+    )
+
+
+@task("order.render_invoice")
+def render_invoice(order_id, payment_method):
+    # Die Zahlung entsteht evtl. erst parallel, die Zahlungsart kommt daher mit
+    invoices.render_invoice(order_id, payment_method)
+
+
+@task("stock.low_alert")
+def low_stock_alert(product_ids):
+    products = Product.objects.filter(id__in=product_ids, stock__lte=settings.LOW_STOCK_THRESHOLD).order_by("id")
+    lines = [f"{product.name} (ID {product.id}): {product.stock} Stück" for product in products]
+    if lines:
+        mail_admins("Niedriger Bestand", "\n".join(lines))
+
+
+def order_key(order_id, step):
+    """Idempotenz-Schlüssel eines Auftrags zur Bestellung."""
+    return f"order:{order_id}:{step}"
+
+
+def order_jobs(order, payment_method, low_stock_ids=()):
+    """Aufträge zu einer neuen Bestellung; die Schlüssel verhindern doppelte Ausführung."""
+    jobs = [
+        job("order.create_payment", key=order_key(order.id, "payment"), order_id=order.id,
+            payment_method=payment_method),
+        job("order.create_shipment", key=order_key(order.id, "shipment"), order_id=order.id),
+        job("order.send_confirmation", key=order_key(order.id, "confirmation"), order_id=order.id),
+        job("order.render_invoice", key=order_key(order.id, "invoice"), order_id=order.id,
+            payment_method=payment_method),
+    ]
+    if low_stock_ids:
+        jobs.append(job("stock.low_alert", key=order_key(order.id, "low-stock"), product_ids=sorted(low_stock_ids)))
+    return jobs
@@ -0,0 +1,103 @@
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .caching import shop_cache
+
+# Das CSRF-Token ist pro Besucher verschieden und wird beim Ausliefern eingesetzt
+CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = b"__shop_csrf_token__"
+
+
+def _is_cacheable(request):
+    if not settings.PAGE_CACHE_ENABLED or request.method != "GET":
+        return False
+    # Nur anonyme Besucher ohne ausstehende Meldungen sehen dieselbe Seite
+    if request.session.get("customer_id"):
+        return False
+    return not len(messages.get_messages(request))
+
+
+async def _ais_cacheable(request):
+    if not settings.PAGE_CACHE_ENABLED or request.method != "GET":
+        return False
+    # aget lädt die Session, danach liest die Message-Storage sie ohne Abfrage
+    if await request.session.aget("customer_id"):
+        return False
+    return not len(messages.get_messages(request))
+
+
+def page_key(request):
+    """Pfad plus Query-String mit sortierten Parametern, als Hash."""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+
+
+def _cached_response(request, cached):
+    content, content_type = cached
+    token = get_token(request).encode()
+    response = HttpResponse(content.replace(CSRF_PLACEHOLDER, token), content_type=content_type)
+    response["X-Page-Cache"] = "hit"
+    return response
+
+
+def _cache_entry(response):
+    """Eintrag für den Cache oder None, wenn die Antwort nicht cachebar ist."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    content = CSRF_INPUT_RE.sub(rb"\g<1>" + CSRF_PLACEHOLDER + rb"\g<2>", response.content)
+    return content, response["Content-Type"]
+
+
+def cache_anonymous_page(namespace, timeout=None):
+    """
+    Cacht die komplette Seite für anonyme Besucher im Shop-Cache, getrennt nach
+    Pfad und Query-String. Die Einträge verfallen mit dem Namespace
+    (siehe signals.py) bzw. nach PAGE_CACHE_TIMEOUT Sekunden. Funktioniert für
+    synchrone und async Views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not await _ais_cacheable(request):
+                    return await view(request, *args, **kwargs)
+
+                key = page_key(request)
+                cached = await shop_cache.aget(namespace, key)
+                if cached is not None:
+                    return _cached_response(request, cached)
+
+                response = await view(request, *args, **kwargs)
+                entry = _cache_entry(response)
+                if entry is not None:
+                    await shop_cache.aset(namespace, key, entry, timeout or settings.PAGE_CACHE_TIMEOUT)
+                    response["X-Page-Cache"] = "miss"
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request)
+            cached = shop_cache.get(namespace, key)
+            if cached is not None:
+                return _cached_response(request, cached)
+
+            response = view(request, *args, **kwargs)
+            entry = _cache_entry(response)
+            if entry is not None:
+                shop_cache.set(namespace, key, entry, timeout or settings.PAGE_CACHE_TIMEOUT)
+                response["X-Page-Cache"] = "miss"
+            return response
+        return wrapper
+    return decorator
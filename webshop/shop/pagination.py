@@ -0,0 +1,111 @@
+import base64
+import json
+import math
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+# Größte ID von BigAutoField (DEFAULT_AUTO_FIELD); größere Zahlen lassen den Datenbanktreiber
+# überlaufen. Gilt für alle IDs aus Anfragen (Cursor, Katalog- und Warenkorb-API)
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(obj, field):
+    value = getattr(obj, field)
+    if isinstance(value, Decimal):
+        value = str(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, obj.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def cursor_position(queryset, field, cursor):
+    """
+    (Wert, ID) aus dem Cursor, passend zum Typ des Sortierfelds, oder None,
+    wenn der Cursor fehlt, kaputt ist oder nicht zum Feld passt.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    if position is None:
+        return None
+    value, pk = position
+    # Nur Skalare aus JSON; bool ist ein int, aber nie ein Sortierwert
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool) or not 0 < pk <= MAX_PK:
+        return None
+    try:
+        try:
+            value = queryset.model._meta.get_field(field).clean(value, None)
+        except FieldDoesNotExist:
+            # Annotation wie "rank" der Suche
+            value = float(value)
+            if not math.isfinite(value):
+                return None
+    except (ValidationError, ValueError, TypeError):
+        return None
+    if value is None or (isinstance(value, Decimal) and not value.is_finite()):
+        return None
+    return value, pk
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_queryset(queryset, field, descending, cursor):
+    """Filter und Sortierung der Keyset-Paginierung, ohne die Seite zu laden."""
+    position = cursor_position(queryset, field, cursor)
+    if position:
+        value, pk = position
+        op = "lt" if descending else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": pk})
+        )
+
+    prefix = "-" if descending else ""
+    return queryset.order_by(f"{prefix}{field}", f"{prefix}id")
+
+
+def _page(items, field, page_size):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1], field)
+    return Page(items, next_cursor)
+
+
+def keyset_page(queryset, field, descending, cursor, page_size):
+    """
+    Keyset-Paginierung über (field, id). Der Cursor merkt sich Sortierwert und
+    ID des letzten Eintrags der Seite; ungültige Cursor starten vorne.
+    """
+    queryset = keyset_queryset(queryset, field, descending, cursor)
+    return _page(list(queryset[:page_size + 1]), field, page_size)
+
+
+async def akeyset_page(queryset, field, descending, cursor, page_size):
+    """``keyset_page`` mit der async ORM-API."""
+    queryset = keyset_queryset(queryset, field, descending, cursor)
+    return _page([obj async for obj in queryset[:page_size + 1]], field, page_size)
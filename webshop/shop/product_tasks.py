@@ -0,0 +1,19 @@
+"""
+Aufträge zu Produkten (shop/tasks.py). Bildvarianten entstehen im Worker statt
+im Request, der das Produkt speichert.
+"""
+from .models import Product
+from .tasks import job, task
+
+
+@task("product.image_derivatives")
+def image_derivatives(product_id, image):
+    product = Product.objects.filter(id=product_id, image=image).first()
+    # Inzwischen gelöscht oder mit anderem Bild gespeichert (dafür gibt es einen eigenen Auftrag)
+    if product is not None:
+        product.generate_image_derivatives()
+
+
+def image_job(product):
+    return job("product.image_derivatives", key=f"product:{product.id}:image:{product.image.name}",
+               product_id=product.id, image=product.image.name)
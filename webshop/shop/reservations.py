@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import StockReservation
+
+RELEASE_BATCH_SIZE = 1000
+
+
+def reservation_ttl():
+    return timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+
+
+def active_reservations(exclude_cart=None):
+    reservations = StockReservation.objects.filter(expires_at__gt=timezone.now())
+    if exclude_cart is not None:
+        reservations = reservations.exclude(cart=exclude_cart)
+    return reservations
+
+
+def reserved_quantities(product_ids, exclude_cart=None):
+    """Aktiv reservierte Menge pro Produkt in einer Aggregat-Abfrage."""
+    rows = (
+        active_reservations(exclude_cart)
+        .filter(product_id__in=product_ids)
+        .values("product_id")
+        .annotate(reserved=Sum("quantity"))
+    )
+    return {row["product_id"]: row["reserved"] for row in rows}
+
+
+def available_stock(product, exclude_cart=None):
+    """Bestand abzüglich der Reservierungen anderer Warenkörbe."""
+    reserved = reserved_quantities([product.id], exclude_cart).get(product.id, 0)
+    return product.stock - reserved
+
+
+def with_availability(products, exclude_cart=None):
+    """Annotiert ``available`` (Bestand minus aktive Reservierungen) per Subquery."""
+    reserved = (
+        active_reservations(exclude_cart)
+        .filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return products.annotate(
+        available=F("stock") - Coalesce(
+            Subquery(reserved, output_field=IntegerField()), Value(0)
+        )
+    )
+
+
+def hold(cart_item):
+    """Reserviert die Menge der Warenkorbposition und verlängert die Haltezeit."""
+    StockReservation.objects.update_or_create(
+        cart_item=cart_item,
+        defaults={
+            "cart_id": cart_item.cart_id,
+            "product_id": cart_item.product_id,
+            "quantity": cart_item.quantity,
+            "expires_at": timezone.now() + reservation_ttl(),
+        },
+    )
+
+
+def hold_many(cart_items):
+    """Wie ``hold`` für mehrere Positionen, als ein Upsert."""
+    expires_at = timezone.now() + reservation_ttl()
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                cart_item=item, cart_id=item.cart_id, product_id=item.product_id,
+                quantity=item.quantity, expires_at=expires_at,
+            )
+            for item in cart_items
+        ],
+        update_conflicts=True,
+        unique_fields=["cart_item"],
+        update_fields=["quantity", "expires_at"],
+    )
+
+
+def release_expired(batch_size=RELEASE_BATCH_SIZE):
+    """Löscht abgelaufene Reservierungen in Batches, gibt die Anzahl zurück."""
+    released = 0
+    now = timezone.now()
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return released
+        released += StockReservation.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,168 @@
+import bisect
+import re
+import threading
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .caching import shop_cache
+from .models import Product
+
+# Textsuchkonfiguration der PostgreSQL-Spalte (siehe Migration 0002)
+SEARCH_CONFIG = "german"
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or "")]
+
+
+class InvertedIndex:
+    """
+    In-Prozess-Index für SQLite (Tests, lokale Entwicklung).
+    Wird beim ersten Zugriff aus der Datenbank aufgebaut und danach über
+    die Signale in signals.py pro Produkt aktualisiert. Er merkt sich den
+    Versionsstempel des Namespace "catalog" im geteilten Cache und baut sich
+    neu auf, sobald ein anderer Prozess (Import, Seeding, Testdaten, anderer
+    Web-Worker) den Katalog invalidiert hat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._postings = {}   # token -> {product_id: gewicht}
+        self._documents = {}  # product_id -> tokens
+        self._tokens = []     # sortiert, für Präfixsuche
+        self._version = None  # Stempel von "catalog" beim Aufbau, None = nicht aufgebaut
+
+    def _ensure_built(self):
+        # Stempel vor dem Lesen holen: ändert sich der Katalog währenddessen, baut der nächste Zugriff neu
+        version = shop_cache.version("catalog")
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            self.reset()
+            rows = Product.objects.values_list("id", "name", "description")
+            for pk, name, description in rows.iterator():
+                self._add(pk, name, description)
+            self._version = version
+
+    def _add(self, pk, name, description):
+        weights = {}
+        for token in tokenize(name):
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                bisect.insort(self._tokens, token)
+            self._postings[token][pk] = weight
+        self._documents[pk] = list(weights)
+
+    def _remove(self, pk):
+        for token in self._documents.pop(pk, ()):
+            postings = self._postings[token]
+            postings.pop(pk, None)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def update(self, product):
+        if self._version is None:
+            return
+        with self._lock:
+            self._remove(product.pk)
+            self._add(product.pk, product.name, product.description)
+
+    def remove(self, pk):
+        if self._version is None:
+            return
+        with self._lock:
+            self._remove(pk)
+
+    def _prefix_matches(self, prefix):
+        scores = {}
+        i = bisect.bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            for pk, weight in self._postings[self._tokens[i]].items():
+                scores[pk] = scores.get(pk, 0) + weight
+            i += 1
+        return scores
+
+    def search(self, query):
+        """Liefert {product_id: score}; alle Suchbegriffe müssen (als Präfix) vorkommen."""
+        self._ensure_built()
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        with self._lock:
+            result = None
+            for term in terms:
+                matches = self._prefix_matches(term)
+                if result is None:
+                    result = matches
+                else:
+                    result = {
+                        pk: score + matches[pk]
+                        for pk, score in result.items()
+                        if pk in matches
+                    }
+                if not result:
+                    return {}
+        return result
+
+
+index = InvertedIndex()
+
+
+def _tsquery(query):
+    # Präfixsuche pro Begriff, damit die Suche schon beim Tippen greift
+    return " & ".join(f"{term}:*" for term in tokenize(query))
+
+
+def _postgres_search(products, query):
+    tsquery = _tsquery(query)
+    table = Product._meta.db_table
+    match = RawSQL(
+        f"{table}.search_vector @@ to_tsquery(%s, %s)",
+        (SEARCH_CONFIG, tsquery),
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f"ts_rank({table}.search_vector, to_tsquery(%s, %s))",
+        (SEARCH_CONFIG, tsquery),
+        output_field=FloatField(),
+    )
+    return products.filter(match).annotate(rank=rank)
+
+
+def _index_search(products, query):
+    scores = index.search(query)
+    if not scores:
+        return products.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    rank = Case(
+        *[When(id=pk, then=Value(score)) for pk, score in scores.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return products.filter(id__in=scores.keys()).annotate(rank=rank)
+
+
+def search_products(products, query):
+    """Filtert auf Treffer und annotiert die Relevanz als ``rank``."""
+    if not tokenize(query):
+        return products.annotate(rank=Value(0.0, output_field=FloatField()))
+    if connection.vendor == "postgresql":
+        return _postgres_search(products, query)
+    return _index_search(products, query)
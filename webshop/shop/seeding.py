@@ -0,0 +1,164 @@
+"""
+Schnelles, idempotentes Einspielen von Fixtures beim Containerstart
+(``manage.py seed_fixtures``, ersetzt ``loaddata``).
+
+Die SHA-256-Prüfsumme der Datei steht nach dem Laden in FixtureLoad. Ist sie
+unverändert, kostet ein erneuter Start eine einzige Abfrage. Sonst wird die
+Datei mit dem C-Parser von PyYAML gelesen (falls vorhanden), durch Djangos
+Deserializer geschickt und pro Modell in Batches per ``bulk_create``
+eingefügt bzw. aktualisiert. Signale laufen dabei nicht: Bestell- und
+Warenkorbsummen, Caches und Suchindex werden am Ende einmal nachgezogen.
+"""
+import hashlib
+import os
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+import yaml
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import carts
+from .caching import NAMESPACES, shop_cache
+from .datagen import BATCH_SIZE, explicit_dates
+from .middleware import invalidate_customer
+from .models import Address, Cart, CartItem, Customer, FixtureLoad, Order, OrderItem
+
+# libyaml ist um ein Vielfaches schneller als der reine Python-Parser
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+MONEY = models.DecimalField(max_digits=10, decimal_places=2)
+
+
+def fixture_path(name):
+    """Sucht wie ``loaddata`` in den fixtures-Ordnern der Apps und in FIXTURE_DIRS."""
+    if os.path.isabs(name) and os.path.isfile(name):
+        return name
+    directories = [os.path.join(app.path, "fixtures") for app in apps.get_app_configs()]
+    directories += [str(directory) for directory in settings.FIXTURE_DIRS]
+    for directory in directories:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"Fixture {name} nicht gefunden.")
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_records(path):
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=SafeLoader) or []
+
+
+def _write(model, objects, batch_size):
+    # Wie loaddata: Datumswerte aus der Fixture übernehmen, fehlende auf jetzt setzen
+    auto_dates = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    now = timezone.now()
+    for obj in objects:
+        for field in auto_dates:
+            if getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, now)
+
+    with explicit_dates(*auto_dates):
+        model.objects.bulk_create(
+            objects,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.name],
+            update_fields=[field.name for field in model._meta.concrete_fields if not field.primary_key],
+        )
+
+
+def _chunks(ids, size=BATCH_SIZE):
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def refresh_order_totals(order_ids):
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    line_total = ExpressionWrapper(F("quantity") * F("price_per_unit"), output_field=MONEY)
+    for chunk in _chunks(order_ids):
+        Order.objects.filter(id__in=chunk).update(
+            item_count=Coalesce(Subquery(items.annotate(total=Sum("quantity")).values("total")), 0),
+            subtotal=Coalesce(
+                Subquery(items.annotate(total=Sum(line_total)).values("total")), Decimal("0"), output_field=MONEY
+            ),
+        )
+
+
+def seed(name, batch_size=BATCH_SIZE, force=False):
+    """
+    Spielt die Fixture ``name`` ein. Gibt die Anzahl Objekte pro Modell zurück
+    oder None, wenn genau dieser Stand schon geladen ist.
+    """
+    path = fixture_path(name)
+    checksum = file_checksum(path)
+    if not force and FixtureLoad.objects.filter(name=name, checksum=checksum).exists():
+        return None
+
+    counts = Counter()
+    pending = defaultdict(list)
+    # Abgeleitete Daten, die sonst Signale bzw. die Views pflegen
+    order_ids, cart_ids, customer_ids = set(), set(), set()
+
+    with transaction.atomic(), connection.constraint_checks_disabled():
+        # Fremdschlüssel werden erst am Ende geprüft, die Reihenfolge in der Datei ist egal
+        for deserialized in serializers.deserialize("python", read_records(path), ignorenonexistent=True):
+            obj = deserialized.object
+            model = type(obj)
+            counts[model] += 1
+            pending[model].append(obj)
+            if len(pending[model]) >= batch_size:
+                _write(model, pending.pop(model), batch_size)
+
+            if model is Order:
+                order_ids.add(obj.pk)
+            elif model is OrderItem:
+                order_ids.add(obj.order_id)
+            elif model is Cart:
+                cart_ids.add(obj.pk)
+            elif model is CartItem:
+                cart_ids.add(obj.cart_id)
+            elif model is Customer:
+                customer_ids.add(obj.pk)
+            elif model is Address:
+                customer_ids.add(obj.customer_id)
+
+        for model, objects in pending.items():
+            _write(model, objects, batch_size)
+
+        connection.check_constraints(table_names=[model._meta.db_table for model in counts])
+        # Explizite Primärschlüssel: Sequenzen (PostgreSQL) hinter das Maximum setzen
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(counts)):
+                cursor.execute(sql)
+
+        refresh_order_totals(order_ids)
+        carts.refresh_summaries(cart_ids)
+        FixtureLoad.objects.update_or_create(name=name, defaults={"checksum": checksum})
+
+        def invalidate():
+            # Der Suchindex baut sich über den neuen Stempel von "catalog" neu auf
+            shop_cache.invalidate(*NAMESPACES)
+            for customer_id in customer_ids:
+                invalidate_customer(customer_id)
+
+        transaction.on_commit(invalidate)
+
+    return {model._meta.label: count for model, count in counts.items()}
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import carts, images, search
+from .caching import NAMESPACES, shop_cache
+from .middleware import invalidate_customer
+from .models import Address, Category, Customer, Order, OrderItem, Product
+from .product_tasks import image_job
+from .tasks import enqueue
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    # Suchindex erst nach erfolgreichem Commit anpassen
+    transaction.on_commit(lambda: search.index.update(instance))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search.index.remove(pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    # Katalog, Produktseiten und Facetten hängen an den Namespace-Versionen
+    transaction.on_commit(lambda: shop_cache.invalidate(*NAMESPACES))
+
+
+@receiver(post_save, sender=Product)
+def product_price_changed(sender, instance, created, raw, update_fields, **kwargs):
+    # Zwischensummen der Warenkörbe rechnen mit dem aktuellen Preis
+    if created or raw or (update_fields is not None and "price" not in update_fields):
+        return
+    carts.refresh_for_products([instance.pk])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, **kwargs):
+    # Gespeicherte Bestellsummen konsistent halten (z.B. Änderungen im Admin)
+    Order(id=instance.order_id).recalculate_totals()
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def customer_changed(sender, instance, **kwargs):
+    # Sofort und nach dem Commit, damit kein Request die alte Version neu cacht
+    invalidate_customer(instance.pk)
+    transaction.on_commit(lambda: invalidate_customer(instance.pk))
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def address_changed(sender, instance, **kwargs):
+    # Standardadressen werden mit dem Kunden zusammen gecacht (Löschen setzt sie per UPDATE auf NULL)
+    invalidate_customer(instance.customer_id)
+    transaction.on_commit(lambda: invalidate_customer(instance.customer_id))
+
+
+@receiver(post_save, sender=Product)
+def product_image_saved(sender, instance, raw, **kwargs):
+    # Fixtures (raw) übernimmt der Befehl generate_image_derivatives
+    if raw or not instance.image:
+        return
+    if instance.image_formats and images.derivatives_exist(instance.image.name):
+        return
+    # Bildverarbeitung im Worker; eingestellt in derselben Transaktion wie das Produkt
+    enqueue(image_job(instance))
@@ -0,0 +1,194 @@
+import asyncio
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+
+# Dateinamen aus dem Manifest-Storage: style.3f2a9c01b4e7.css
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+BLOCK_SIZE = 64 * 1024
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _url_prefix(url):
+    return "/" + url.strip("/") + "/"
+
+
+def accepted_encodings(header):
+    """
+    Kodierungen aus ENCODINGS, die der Client laut Accept-Encoding annimmt:
+    q=0 lehnt ab, ``*`` gilt für alle nicht genannten.
+    """
+    qualities = {}
+    for part in header.split(","):
+        coding, *params = [value.strip() for value in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    return {encoding for encoding, _ in ENCODINGS if qualities.get(encoding, wildcard) > 0}
+
+
+class StaticFilesApp:
+    """
+    WSGI-Schicht vor Django, die STATIC_ROOT und MEDIA_ROOT direkt ausliefert.
+
+    Dateien gehen über ``wsgi.file_wrapper`` raus, Gunicorn nutzt dafür
+    ``sendfile`` ohne Kopie durch Python. Vorkomprimierte ``.br``/``.gz``-Varianten
+    werden nach Accept-Encoding gewählt. Jede Antwort hat ETag und Last-Modified
+    und beantwortet bedingte Anfragen mit 304. Gehashte statische Dateien sind
+    ``immutable``. Was nicht gefunden wird, geht an Django weiter.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.roots = [
+            # (URL-Präfix, Verzeichnis, max-age, gehashte Namen sind immutable)
+            (_url_prefix(settings.STATIC_URL), os.path.realpath(settings.STATIC_ROOT), settings.STATIC_MAX_AGE, True),
+            (_url_prefix(settings.MEDIA_URL), os.path.realpath(settings.MEDIA_ROOT), settings.MEDIA_MAX_AGE, False),
+        ]
+
+    def __call__(self, environ, start_response):
+        found = self.lookup(environ)
+        if found is None:
+            return self.application(environ, start_response)
+
+        status, headers, filename = found
+        start_response(status, headers)
+        if filename is None or environ["REQUEST_METHOD"] == "HEAD":
+            return []
+
+        f = open(filename, "rb")
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if file_wrapper is not None:
+            return file_wrapper(f, BLOCK_SIZE)
+        return _FileIterator(f)
+
+    def lookup(self, environ):
+        """(Status, Header, Datei oder None bei 304) für eine statische Datei, sonst None."""
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+            return None
+        path = environ.get("PATH_INFO", "")
+        for prefix, root, max_age, hashed in self.roots:
+            if path.startswith(prefix):
+                filename = self.find_file(root, path[len(prefix):])
+                if filename is None:
+                    return None
+                if hashed and HASHED_NAME_RE.search(filename):
+                    cache_control = IMMUTABLE
+                else:
+                    cache_control = f"public, max-age={max_age}"
+                return self.respond(environ, filename, cache_control)
+        return None
+
+    def find_file(self, root, relative):
+        # PATH_INFO ist Latin-1-dekodiert (PEP 3333), Dateinamen sind UTF-8
+        relative = relative.encode("latin-1").decode("utf-8", "replace")
+        filename = os.path.realpath(os.path.join(root, relative))
+        if not filename.startswith(root + os.sep) or not os.path.isfile(filename):
+            return None
+        return filename
+
+    def respond(self, environ, filename, cache_control):
+        content_type, _ = mimetypes.guess_type(filename)
+        content_type = content_type or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+            content_type += "; charset=utf-8"
+
+        headers = [("Content-Type", content_type), ("Cache-Control", cache_control)]
+        accepted = accepted_encodings(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        variants = [(encoding, filename + suffix) for encoding, suffix in ENCODINGS if os.path.isfile(filename + suffix)]
+        if variants:
+            headers.append(("Vary", "Accept-Encoding"))
+        for encoding, variant in variants:
+            if encoding in accepted:
+                filename = variant
+                headers.append(("Content-Encoding", encoding))
+                break
+
+        stat = os.stat(filename)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers += [("ETag", etag), ("Last-Modified", formatdate(stat.st_mtime, usegmt=True))]
+
+        if self.not_modified(environ, etag, stat.st_mtime):
+            return "304 Not Modified", headers, None
+
+        headers.append(("Content-Length", str(stat.st_size)))
+        return "200 OK", headers, filename
+
+    def not_modified(self, environ, etag, mtime):
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        if_modified_since = environ.get("HTTP_IF_MODIFIED_SINCE")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class StaticFilesASGIApp(StaticFilesApp):
+    """
+    Dieselbe Auslieferung vor der ASGI-Anwendung (Uvicorn-Worker). Ohne
+    ``sendfile`` werden die Dateien blockweise in einem Thread gelesen.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.application(scope, receive, send)
+
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            # wie PATH_INFO unter WSGI: UTF-8-Bytes als Latin-1
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        }
+        for name, value in scope["headers"]:
+            environ["HTTP_" + name.decode("latin-1").upper().replace("-", "_")] = value.decode("latin-1")
+
+        found = await asyncio.to_thread(self.lookup, environ)
+        if found is None:
+            return await self.application(scope, receive, send)
+
+        status, headers, filename = found
+        await send({
+            "type": "http.response.start",
+            "status": int(status.split()[0]),
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+        if filename is None or scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(filename, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, BLOCK_SIZE)
+                more = len(chunk) == BLOCK_SIZE
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+                if not more:
+                    break
+
+
+class _FileIterator:
+    def __init__(self, f):
+        self.f = f
+
+    def __iter__(self):
+        while chunk := self.f.read(BLOCK_SIZE):
+            yield chunk
+
+    def close(self):
+        self.f.close()
@@ -0,0 +1,75 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:  # optional, ohne Brotli gibt es nur .gz
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt", ".html", ".xml"}
+# Kleine Dateien lohnen sich nicht, der Header-Overhead frisst die Ersparnis
+MIN_COMPRESS_SIZE = 256
+
+
+def compressed_variants(content):
+    """(Endung, Inhalt) für jede Kompression, die mindestens 5 % spart."""
+    variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(content, quality=11)))
+    return [(suffix, data) for suffix, data in variants if len(data) < len(content) * 0.95]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest-Storage mit Hash im Dateinamen, der bei ``collectstatic`` zusätzlich
+    vorkomprimierte ``.gz``/``.br``-Varianten ablegt. Ausgeliefert werden sie von
+    ``shop.static_wsgi.StaticFilesApp`` ohne Kompression zur Laufzeit.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            if not self.exists(name):
+                continue
+            with self.open(name) as f:
+                content = f.read()
+            if len(content) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, data in compressed_variants(content):
+                target = name + suffix
+                if self.exists(target):
+                    self.delete(target)
+                self._save(target, ContentFile(data))
+
+
+class InvoiceStorage(FileSystemStorage):
+    """
+    Rechnungen unter INVOICE_ROOT statt MEDIA_ROOT: weder ``static()`` noch
+    ``shop.static_wsgi`` liefern sie aus, nur ``views_order.order_invoice_file``
+    nach der Prüfung des Kunden.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.INVOICE_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "INVOICE_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
+
+    def url(self, name):
+        raise ValueError("Rechnungen haben keine öffentliche URL.")
@@ -0,0 +1,210 @@
+"""
+Task-Queue in der Datenbank für Nebenwirkungen, die nicht im Request laufen
+müssen (Zahlung und Versand anlegen, Bestätigungsmail, Bestandswarnung).
+
+Aufträge werden in derselben Transaktion wie die Bestellung eingestellt, es
+gibt also weder Aufträge zu zurückgerollten Bestellungen noch Bestellungen
+ohne Aufträge. Worker (``manage.py run_tasks``) holen fällige Aufträge mit
+``SELECT ... FOR UPDATE SKIP LOCKED``, mehrere Worker blockieren sich dabei
+nicht gegenseitig. Ein Auftrag und sein Abschluss laufen in einer
+Transaktion; schlägt er fehl, wird er mit exponentiell wachsender Wartezeit
+erneut versucht, nach ``max_attempts`` Versuchen bleibt er als ``failed``
+stehen.
+
+Handler registrieren sich mit ``@task("name")`` und bekommen die Payload als
+Keyword-Argumente. Sie müssen idempotent sein: ein Worker kann nach dem
+Auftrag, aber vor dem Commit abstürzen.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Obergrenze der Wartezeit zwischen zwei Versuchen (Sekunden)
+MAX_RETRY_DELAY = 3600
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name, max_attempts=5):
+    """Registriert einen Handler unter ``name``."""
+    def decorator(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def job(name, key=None, delay=0, **payload):
+    """Ungespeicherter Auftrag für ``enqueue``. ``key`` macht ihn idempotent."""
+    if name not in TASKS:
+        raise UnknownTask(name)
+    return Task(
+        name=name,
+        payload=payload,
+        idempotency_key=key,
+        max_attempts=TASKS[name].max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue(*jobs):
+    """Stellt Aufträge mit einem INSERT ein, bereits vorhandene Schlüssel werden übersprungen."""
+    Task.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+def retry_delay(attempt):
+    """Exponentiell mit Jitter, damit wiederholte Fehler nicht im Gleichschritt laufen."""
+    delay = min(settings.TASK_RETRY_DELAY * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(worker):
+    """Nächster fälliger Auftrag (als ``running`` markiert) oder None."""
+    now = timezone.now()
+    with transaction.atomic():
+        candidate = (
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if candidate is None:
+            return None
+        # Bedingt, weil SQLite kein FOR UPDATE kennt: nur einer gewinnt
+        claimed = Task.objects.filter(id=candidate.id, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1,
+        )
+    if not claimed:
+        return None
+    candidate.status, candidate.locked_by, candidate.locked_at = Task.RUNNING, worker, now
+    candidate.attempts += 1
+    return candidate
+
+
+def execute(item):
+    """Führt einen geholten Auftrag aus, gibt den neuen Status zurück."""
+    try:
+        handler = TASKS.get(item.name)
+        if handler is None:
+            raise UnknownTask(item.name)
+        with transaction.atomic():
+            handler(**item.payload)
+            Task.objects.filter(id=item.id).update(status=Task.DONE, finished_at=timezone.now(), last_error="")
+        return Task.DONE
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if item.attempts >= item.max_attempts or item.name not in TASKS:
+            logger.error("Auftrag %s endgültig fehlgeschlagen:\n%s", item, error)
+            Task.objects.filter(id=item.id).update(status=Task.FAILED, finished_at=now, last_error=error)
+            return Task.FAILED
+        delay = retry_delay(item.attempts)
+        logger.warning("Auftrag %s fehlgeschlagen, neuer Versuch in %.0f s:\n%s", item, delay, error)
+        Task.objects.filter(id=item.id).update(
+            status=Task.QUEUED, run_after=now + timedelta(seconds=delay), locked_by="", last_error=error,
+        )
+        return Task.QUEUED
+
+
+def requeue_stale():
+    """
+    Aufträge abgestürzter Worker wieder freigeben. Wer schon ``max_attempts``
+    Versuche hatte, bleibt als ``failed`` stehen (sonst hält ein Auftrag, der
+    den Worker abstürzen lässt, die Queue unbegrenzt auf). Gibt die Anzahl
+    wieder eingestellter Aufträge zurück.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT))
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Task.FAILED, locked_by="", finished_at=now,
+        last_error="Worker nach dem letzten Versuch abgebrochen (TASK_LOCK_TIMEOUT überschritten).",
+    )
+    if failed:
+        logger.error("%d Aufträge nach dem letzten Versuch abgebrochen, als failed markiert", failed)
+    return stale.update(status=Task.QUEUED, locked_by="", run_after=now)
+
+
+def _loop(worker, stop, once, poll_interval, results):
+    next_requeue = time.monotonic()
+    try:
+        while not stop.is_set():
+            # Abgebrochene oder zu alte Verbindungen ersetzen (nicht innerhalb einer Transaktion, z.B. in Tests)
+            if not connection.in_atomic_block:
+                close_old_connections()
+            try:
+                # Nach Zeit statt nur im Leerlauf: bei voller Queue blieben Aufträge abgestürzter Worker sonst liegen
+                if time.monotonic() >= next_requeue:
+                    requeue_stale()
+                    next_requeue = time.monotonic() + poll_interval
+                item = claim(worker)
+                if item is None:
+                    if once:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+                results[execute(item)] += 1
+            except DatabaseError:
+                # Verbindung weg oder Sperre (SQLite): kurz warten, der Auftrag bleibt in der Queue
+                logger.exception("Worker %s: Datenbankfehler", worker)
+                if not connection.in_atomic_block:
+                    connection.close()
+                stop.wait(poll_interval)
+    finally:
+        # Threads bekommen eigene Verbindungen, die Django nicht selbst schließt
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def work(concurrency=1, once=False, poll_interval=1.0, stop=None):
+    """
+    Arbeitet Aufträge mit ``concurrency`` Threads ab, bis ``stop`` gesetzt
+    ist bzw. mit ``once`` bis nichts mehr fällig ist. Gibt die Anzahl pro
+    Ergebnis zurück. Mit einem Thread läuft alles im aufrufenden Thread.
+    """
+    stop = stop or threading.Event()
+    results = Counter()
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    if concurrency <= 1:
+        _loop(name, stop, once, poll_interval, results)
+        return results
+
+    # Counter-Updates sind unter dem GIL nicht atomar, daher ein Counter pro Thread
+    per_thread = [Counter() for _ in range(concurrency)]
+    threads = [
+        threading.Thread(target=_loop, args=(f"{name}:{i}", stop, once, poll_interval, per_thread[i]), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for counts in per_thread:
+        results.update(counts)
+    return results
+
+
+def stop_on_signals(stop):
+    """SIGTERM/SIGINT beenden den Worker nach dem laufenden Auftrag."""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
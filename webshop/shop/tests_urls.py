@@ -0,0 +1,36 @@
+"""URLconf der Tests: async-Views (AsyncViewTests) und Views für die Query-Budgets."""
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseServerError
+from django.urls import path
+
+from . import instrumentation, urls as shop_urls, views_async
+from .models import Category, Product
+
+
+@instrumentation.query_budget(3, duplicates=0)
+def n_plus_one_view(request):
+    names = [product.category.category_name for product in Product.objects.all()]
+    return HttpResponse(", ".join(names))
+
+
+@instrumentation.query_budget(4, duplicates=0)
+def two_transactions_view(request):
+    with transaction.atomic():
+        Product.objects.count()
+    with transaction.atomic():
+        Product.objects.exists()
+    return HttpResponse("ok")
+
+
+@instrumentation.query_budget(1)
+def failing_view(request):
+    list(Product.objects.all())
+    list(Category.objects.all())
+    return HttpResponseServerError("kaputt")
+
+
+urlpatterns = views_async.with_async_views(shop_urls.urlpatterns) + [
+    path("n-plus-one/", n_plus_one_view, name="n_plus_one"),
+    path("two-transactions/", two_transactions_view, name="two_transactions"),
+    path("failing/", failing_view, name="failing"),
+]
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views, views_cart, views_login, views_order, views_product, views_wishlist
+from . import (
+    views, views_api, views_async, views_cart, views_login, views_metrics, views_order, views_product,
+    views_wishlist,
+)
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -14,10 +18,21 @@ urlpatterns = [
     path("checkout/", views_cart.checkout, name="checkout"),
     path("orders/", views_order.orders_list, name="orders_list"),
     path("orders/<int:order_id>/", views_order.order_detail, name="order_detail"),
+    path("orders/<int:order_id>/invoice/", views_order.order_invoice, name="order_invoice"),
+    path("orders/<int:order_id>/invoice/<slug:digest>.html", views_order.order_invoice_file,
+         name="order_invoice_file"),
     path("product/<int:product_id>/", views_product.product_detail, name="product_detail"),
     path("wishlist/", views_wishlist.wishlist_view, name="wishlist"),
     path("wishlist/add/<int:product_id>/", views_wishlist.wishlist_add, name="wishlist_add"),
     path("register/", views_login.register_view, name="register"),
     path("account/", views_login.account_view, name="account"),
+    path("metrics/", views_metrics.metrics, name="metrics"),
+    path("api/v1/products/", views_api.products, name="api_products"),
+    path("api/v1/products/<int:product_id>/", views_api.product, name="api_product"),
+    path("api/v1/categories/", views_api.categories, name="api_categories"),
+    path("api/v1/cart/", views_api.cart, name="api_cart"),
 
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = views_async.with_async_views(urlpatterns)
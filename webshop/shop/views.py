@@ -1,87 +1,65 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q
-from .models import Product, Customer, Cart, CartItem, Category
+from . import carts
+from .models import Product
+from .catalog import catalog_filters, product_page
+from .facets import catalog_facets
+from .instrumentation import query_budget
+from .pagecache import cache_anonymous_page
 
+@query_budget(2)
 def home(request):
     return render(request, "home.html")
 
+@query_budget(6, duplicates=0)
+@cache_anonymous_page("catalog")
 def product_list(request):
-    products = Product.objects.all()
-    categories = Category.objects.all()
-    
-    # Filter nach Kategorie
-    category_id = request.GET.get('category')
-    if category_id:
-        products = products.filter(category_id=category_id)
-    
-    # Filter nach Preis
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    
-    # Suche nach Name oder Beschreibung
-    search_query = request.GET.get('search')
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
-    # Sortierung
-    sort_by = request.GET.get('sort', 'name')
-    if sort_by == 'price_asc':
-        products = products.order_by('price')
-    elif sort_by == 'price_desc':
-        products = products.order_by('-price')
-    elif sort_by == 'name':
-        products = products.order_by('name')
-    
-    context = {
-        "products": products,
-        "categories": categories,
-        "selected_category": category_id,
-        "min_price": min_price,
-        "max_price": max_price,
-        "search_query": search_query,
-        "sort_by": sort_by,
+    filters = catalog_filters(request.GET)
+    facets = catalog_facets(filters)
+
+    page = product_page(filters, cursor=request.GET.get('cursor'))
+    return render(request, "products.html", product_list_context(request, filters, facets, page))
+
+def product_list_context(request, filters, facets, page):
+    """Template-Kontext des Katalogs, gemeinsam mit views_async.product_list."""
+    # Query-String ohne Cursor für die Blätter-Links
+    page_params = request.GET.copy()
+    page_params.pop('cursor', None)
+
+    return {
+        "products": page,
+        "product_count": facets["total"],
+        "next_cursor": page.next_cursor,
+        "is_first_page": not request.GET.get('cursor'),
+        "page_query": page_params.urlencode(),
+        "categories": facets["categories"],
+        "price_bands": facets["price_bands"],
+        "price_range": (facets["min_price"], facets["max_price"]),
+        "selected_category": filters["category"],
+        "min_price": filters["min_price"],
+        "max_price": filters["max_price"],
+        "search_query": filters["search"],
+        "sort_by": filters["sort"],
     }
-    return render(request, "products.html", context)
 
 def add_to_cart(request, product_id):
-    customer_id = request.session.get("customer_id")
-    if not customer_id:
+    if not request.customer:
         messages.error(request, "Bitte logge dich ein, um Artikel zum Warenkorb hinzuzufügen.")
         return redirect("product_list")
 
-    customer = Customer.objects.get(id=customer_id)
     product = get_object_or_404(Product, id=product_id)
 
-    if product.stock <= 0:
-        messages.error(request, "Dieses Produkt ist leider ausverkauft.")
-        return redirect("product_list")
-    
-    cart, _ = Cart.objects.get_or_create(customer=customer)
-
-    cart_item, item_created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        defaults={"quantity": 1}
-    )
-    
-    if not item_created:
-        if cart_item.quantity < cart_item.product.stock:
-            cart_item.quantity += 1
-            cart_item.save()
+    # Prüfen und Reservieren in einer Transaktion, die Menge wird unter der Sperre erhöht
+    try:
+        items = carts.set_quantities(request.cart, {product.id: 1}, relative=True)
+    except carts.CartUpdateError as e:
+        if e.errors[0].get("available", 0) <= 0:
+            messages.error(request, "Dieses Produkt ist leider ausverkauft.")
         else:
-            messages.error(request, f"Nicht genug Bestand für {cart_item.product.name}.")
-            return redirect("product_list")
+            messages.error(request, e.errors[0]["error"])
+        return redirect("product_list")
 
-    total_items = sum(item.quantity for item in CartItem.objects.filter(cart=cart))
-    request.session['cart_items_count'] = total_items
+    request.session['cart_items_count'] = carts.summarize(items)[0]
 
     messages.success(request, f"{product.name} wurde in den Warenkorb gelegt.")
     return redirect("product_list")
@@ -0,0 +1,242 @@
+"""
+JSON-API unter /api/v1/.
+
+Katalog (nur lesend): gleiche Filter wie product_list, Feldauswahl per
+``fields``, Keyset-Cursor. Das ETag hängt nur an der Katalogversion des
+Shop-Caches, dem Zeitfenster CATALOG_API_MAX_AGE und der Anfrage, ein 304
+kommt daher ohne Datenbankzugriff zustande.
+
+Warenkorb: Authentifizierung wie im Shop über die Session, schreibende
+Requests brauchen daher den CSRF-Header (X-CSRFToken).
+"""
+import hashlib
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_http_methods
+
+from . import carts
+from .caching import shop_cache
+from .catalog import PAGE_SIZE, catalog_filters, catalog_products, product_page
+from .facets import catalog_facets
+from .instrumentation import query_budget
+from .models import Product
+from .pagecache import page_key
+from .pagination import MAX_PK
+
+# Obergrenze für Positionen pro Request und für die Menge einer Position
+CART_MAX_LINES = 100
+CART_MAX_QUANTITY = 1000
+
+# Feld -> Wert am Produkt (geladen mit catalog_products: Kategorie und Verfügbarkeit)
+PRODUCT_FIELDS = {
+    "id": attrgetter("id"),
+    "sku": attrgetter("sku"),
+    "name": attrgetter("name"),
+    "description": attrgetter("description"),
+    "price": attrgetter("price"),
+    "category": attrgetter("category_id"),
+    "category_name": lambda product: product.category.category_name,
+    "available": lambda product: max(product.available, 0),
+    "image": lambda product: product.image.url if product.image else None,
+    "updated_at": attrgetter("updated_at"),
+}
+DEFAULT_PRODUCT_FIELDS = ("id", "name", "price", "category", "available")
+MAX_LIMIT = 100
+
+
+def catalog_etag(request, *args, **kwargs):
+    """Starkes ETag aus Katalogversion, Zeitfenster und normalisierter Anfrage."""
+    window = int(time.time() // settings.CATALOG_API_MAX_AGE)
+    raw = f"{shop_cache.version('catalog')}:{window}:{page_key(request)}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def catalog_response(request, build):
+    """
+    JSON aus ``build()``, kompakt serialisiert und unter dem ETag im Shop-Cache
+    abgelegt: gleiches ETag, gleicher Inhalt. ``build`` gibt None für 404 zurück
+    und wirft ValueError (oder ValidationError aus dem ORM) für ungültige Parameter.
+    """
+    key = f"api:{catalog_etag(request)}"
+    body = shop_cache.get("catalog", key)
+    if body is None:
+        try:
+            data = build()
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except ValidationError as e:
+            return JsonResponse({"error": " ".join(e.messages)}, status=400)
+        if data is None:
+            return JsonResponse({"error": "Nicht gefunden."}, status=404)
+        body = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"), ensure_ascii=False)
+        shop_cache.set("catalog", key, body, settings.CATALOG_API_MAX_AGE)
+    return HttpResponse(body, content_type="application/json")
+
+
+def selected_fields(params):
+    if not params.get("fields"):
+        return DEFAULT_PRODUCT_FIELDS
+    fields = [field.strip() for field in params["fields"].split(",") if field.strip()]
+    unknown = [field for field in fields if field not in PRODUCT_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unbekannte Felder: {', '.join(unknown)}. Erlaubt: {', '.join(PRODUCT_FIELDS)}.")
+    return fields
+
+
+def api_filters(params):
+    """catalog_filters plus Prüfung der Werte (die HTML-Seite verlässt sich aufs Formular)."""
+    filters = catalog_filters(params)
+    category = filters["category"]
+    if category and not (category.isascii() and category.isdigit() and int(category) <= MAX_PK):
+        raise ValueError("category muss eine Kategorie-ID sein.")
+    for key in ("min_price", "max_price"):
+        if filters[key]:
+            try:
+                finite = Decimal(filters[key]).is_finite()
+            except InvalidOperation:
+                finite = False
+            if not finite:
+                raise ValueError(f"{key} muss eine Zahl sein.")
+    return filters
+
+
+def page_limit(params):
+    try:
+        limit = int(params.get("limit") or PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit muss eine ganze Zahl sein.")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit muss zwischen 1 und {MAX_LIMIT} liegen.")
+    return limit
+
+
+def serialize_product(product, fields):
+    return {field: PRODUCT_FIELDS[field](product) for field in fields}
+
+
+def catalog_endpoint(view):
+    """Nur GET, ETag/304 über catalog_etag und Cache-Control für Katalog-Endpunkte."""
+    view = cache_control(max_age=settings.CATALOG_API_MAX_AGE)(view)
+    view = condition(etag_func=catalog_etag)(view)
+    return require_GET(view)
+
+
+@query_budget(3, duplicates=0)
+@catalog_endpoint
+def products(request):
+    """Produktliste: Filter wie product_list, ``fields``, ``limit`` und ``cursor``."""
+    def build():
+        fields = selected_fields(request.GET)
+        filters = api_filters(request.GET)
+        page = product_page(filters, cursor=request.GET.get("cursor"), page_size=page_limit(request.GET))
+        return {
+            "results": [serialize_product(product, fields) for product in page],
+            "next_cursor": page.next_cursor,
+        }
+    return catalog_response(request, build)
+
+
+@query_budget(2, duplicates=0)
+@catalog_endpoint
+def product(request, product_id):
+    def build():
+        fields = selected_fields(request.GET)
+        product = catalog_products(Product.objects.filter(id=product_id)).first()
+        return serialize_product(product, fields) if product else None
+    return catalog_response(request, build)
+
+
+@query_budget(2, duplicates=0)
+@catalog_endpoint
+def categories(request):
+    """Alle Kategorien mit Anzahl Produkte (aus den gecachten Facetten)."""
+    def build():
+        facets = catalog_facets(catalog_filters({}))
+        return {
+            "results": [
+                {"id": category["id"], "name": category["category_name"], "count": category["count"]}
+                for category in facets["categories"]
+            ],
+        }
+    return catalog_response(request, build)
+
+
+def parse_quantities(body):
+    """``{"items": [{"product_id": 1, "quantity": 2}, ...]}`` -> ``{1: 2, ...}``."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ValueError("Ungültiges JSON.")
+    lines = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(lines, list) or not lines:
+        raise ValueError('Erwartet {"items": [{"product_id": ..., "quantity": ...}, ...]}.')
+    if len(lines) > CART_MAX_LINES:
+        raise ValueError(f"Höchstens {CART_MAX_LINES} Positionen pro Request.")
+
+    quantities = {}
+    for line in lines:
+        product_id = line.get("product_id") if isinstance(line, dict) else None
+        quantity = line.get("quantity") if isinstance(line, dict) else None
+        # bool ist in Python ein int, als Menge aber sicher ein Fehler
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in (product_id, quantity)):
+            raise ValueError("product_id und quantity müssen ganze Zahlen sein.")
+        if not 1 <= product_id <= MAX_PK:
+            raise ValueError(f"product_id muss zwischen 1 und {MAX_PK} liegen.")
+        if not 0 <= quantity <= CART_MAX_QUANTITY:
+            raise ValueError(f"quantity muss zwischen 0 und {CART_MAX_QUANTITY} liegen.")
+        if product_id in quantities:
+            raise ValueError(f"Produkt {product_id} ist doppelt angegeben.")
+        quantities[product_id] = quantity
+    return quantities
+
+
+def cart_response(request, items):
+    item_count, subtotal = carts.summarize(items)
+    request.session["cart_items_count"] = item_count
+    return JsonResponse({
+        "item_count": item_count,
+        "subtotal": subtotal,
+        "items": [
+            {
+                "id": item.id,
+                "product_id": item.product_id,
+                "name": item.product.name,
+                "price": item.product.price,
+                "quantity": item.quantity,
+                "line_total": item.product.price * item.quantity,
+            }
+            for item in items
+        ],
+    })
+
+
+@query_budget(20, duplicates=0)
+@require_http_methods(["GET", "POST"])
+def cart(request):
+    """
+    GET liefert den Warenkorb, POST setzt mehrere Mengen auf einmal (0 entfernt
+    die Position) und liefert den neuen Stand. Bei zu wenig Bestand antwortet
+    die API mit 409 und ändert nichts.
+    """
+    if not request.customer:
+        return JsonResponse({"error": "Bitte einloggen."}, status=401)
+    if request.method == "GET":
+        return cart_response(request, carts.cart_items(request.cart))
+
+    try:
+        quantities = parse_quantities(request.body)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    try:
+        items = carts.set_quantities(request.cart, quantities)
+    except carts.CartUpdateError as e:
+        return JsonResponse({"error": str(e), "errors": e.errors}, status=409)
+    return cart_response(request, items)
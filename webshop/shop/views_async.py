@@ -0,0 +1,109 @@
+"""
+Async-Varianten der lesenden Views für den Betrieb unter ASGI (ASYNC_VIEWS=1).
+Sie liefern dieselben Seiten wie die synchronen Views, fragen aber über die
+async ORM-API ab und warten auf unabhängige Abfragen gleichzeitig.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.urls import path
+
+from .caching import shop_cache
+from .catalog import aproduct_page, catalog_filters
+from .facets import acatalog_facets
+from .instrumentation import query_budget
+from .models import Order, Product, Wishlist, WishlistItem
+from .pagecache import cache_anonymous_page
+from .pagination import akeyset_page
+from .reservations import with_availability
+from .views import product_list_context
+from .views_order import ORDERS_PAGE_SIZE
+from .views_product import PRODUCT_CACHE_TIMEOUT
+
+# Rendern liest Session, Meldungen und Lazy-Objekte, das bleibt synchron
+arender = sync_to_async(render)
+
+
+@query_budget(6, duplicates=0)
+@cache_anonymous_page("catalog")
+async def product_list(request):
+    filters = catalog_filters(request.GET)
+    facets, page = await asyncio.gather(
+        acatalog_facets(filters),
+        aproduct_page(filters, cursor=request.GET.get("cursor")),
+    )
+    return await arender(request, "products.html", product_list_context(request, filters, facets, page))
+
+
+@query_budget(4, duplicates=0)
+@cache_anonymous_page("product")
+async def product_detail(request, product_id):
+    async def load():
+        return await Product.objects.aget(id=product_id)
+
+    # Verfügbarkeit live, Produkt aus dem Cache: beides gleichzeitig
+    try:
+        available, product = await asyncio.gather(
+            with_availability(Product.objects.filter(id=product_id))
+            .values_list("available", flat=True)
+            .afirst(),
+            shop_cache.aget_or_set("product", product_id, load, PRODUCT_CACHE_TIMEOUT),
+        )
+    except Product.DoesNotExist:
+        raise Http404("Produkt nicht gefunden.")
+    if available is None:
+        raise Http404("Produkt nicht gefunden.")
+
+    product.available = available
+    return await arender(request, "product_detail.html", {"product": product})
+
+
+@query_budget(4, duplicates=0)
+async def wishlist_view(request):
+    customer = await request.acustomer()
+    if not customer:
+        messages.error(request, "Bitte logge dich ein, um deine Wunschliste zu sehen.")
+        return redirect("login")
+
+    wishlist, _ = await Wishlist.objects.aget_or_create(customer=customer)
+    items = [
+        item async for item in
+        WishlistItem.objects.filter(wishlist=wishlist).select_related("product__category")
+    ]
+    return await arender(request, "wishlist.html", {"items": items})
+
+
+@query_budget(4, duplicates=0)
+async def orders_list(request):
+    customer = await request.acustomer()
+    if not customer:
+        messages.error(request, "Bitte logge dich ein.")
+        return redirect("login")
+
+    orders = Order.objects.filter(customer_id=customer.id)
+    page = await akeyset_page(orders, "order_date", True, request.GET.get("cursor"), ORDERS_PAGE_SIZE)
+    return await arender(request, "orders.html", {
+        "orders": page,
+        "next_cursor": page.next_cursor,
+        "is_first_page": not request.GET.get("cursor"),
+    })
+
+
+VIEWS = {
+    "product_list": product_list,
+    "product_detail": product_detail,
+    "wishlist": wishlist_view,
+    "orders_list": orders_list,
+}
+
+
+def with_async_views(urlpatterns):
+    """Ersetzt in ``urlpatterns`` die lesenden Views durch ihre async-Varianten."""
+    return [
+        path(str(pattern.pattern), VIEWS[pattern.name], name=pattern.name)
+        if pattern.name in VIEWS else pattern
+        for pattern in urlpatterns
+    ]
@@ -1,84 +1,70 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from decimal import Decimal
-from .models import Customer, Cart, CartItem, Order, OrderItem, Address, Payment, Shipment
+from django.db import transaction
+from . import carts
+from .models import CartItem, Address, Payment
+from .checkout import CheckoutError, place_order
+from .instrumentation import query_budget
 
+@query_budget(8, duplicates=0)
 def cart_view(request):
-    customer_id = request.session.get("customer_id")
-    if not customer_id:
+    if not request.customer:
         messages.error(request, "Bitte logge dich ein, um deinen Warenkorb zu sehen.")
         return redirect("product_list")
 
-    customer = Customer.objects.get(id=customer_id)
-    cart, _ = Cart.objects.get_or_create(customer=customer)
-    cart_items = CartItem.objects.filter(cart=cart)
+    cart = request.cart
+    # Positionen samt Produkt in einer Abfrage
+    cart_items = CartItem.objects.filter(cart=cart).select_related("product")
 
     for item in cart_items:
         item.total_price = item.product.price * item.quantity
 
-    total_price = sum(item.total_price for item in cart_items)
-
+    # Gepflegte Zwischensumme (carts.set_quantities, Preisänderungen) statt erneut summieren
     context = {
         "cart_items": cart_items,
-        "total_price": total_price,
+        "total_price": cart.subtotal,
     }
     return render(request, "cart.html", context)
 
+def change_quantity(request, item_id, quantity, relative=False):
+    """
+    Ändert die Menge einer Position des eigenen Warenkorbs über
+    carts.set_quantities (gesperrt, Bestand geprüft, Summen neu berechnet).
+    Gibt die Position zurück oder None, wenn der Bestand nicht reicht.
+    """
+    cart_item = get_object_or_404(CartItem, id=item_id, cart=request.cart)
+    try:
+        items = carts.set_quantities(request.cart, {cart_item.product_id: quantity}, relative=relative)
+    except carts.CartUpdateError as e:
+        messages.error(request, e.errors[0]["error"])
+        return None
+    request.session['cart_items_count'] = carts.summarize(items)[0]
+    return cart_item
+
 def cart_increase(request, item_id):
-    cart_item = CartItem.objects.get(id=item_id)
-    
-    if cart_item.quantity >= cart_item.product.stock:
-        messages.error(request, f"Nicht genug Bestand für {cart_item.product.name}.")
-        return redirect("cart")
-    else: 
-        cart_item.quantity += 1
-        cart_item.save()
-        
-        # Update session cart count
-        total_items = sum(item.quantity for item in CartItem.objects.filter(cart=cart_item.cart))
-        request.session['cart_items_count'] = total_items
-        
+    if change_quantity(request, item_id, 1, relative=True):
         messages.success(request, "Menge erhöht.")
-        return redirect("cart")
+    return redirect("cart")
 
 def cart_decrease(request, item_id):
-    cart_item = CartItem.objects.get(id=item_id)
-    cart = cart_item.cart
-    
-    if cart_item.quantity > 1:
-        cart_item.quantity -= 1
-        cart_item.save()
-    else:
-        cart_item.delete()
-    
-    # Update session cart count
-    total_items = sum(item.quantity for item in CartItem.objects.filter(cart=cart))
-    request.session['cart_items_count'] = total_items
-    
-    messages.info(request, "Menge aktualisiert.")
+    # Bei Menge 1 wird die Position entfernt
+    if change_quantity(request, item_id, -1, relative=True):
+        messages.info(request, "Menge aktualisiert.")
     return redirect("cart")
 
 def cart_remove(request, item_id):
-    cart_item = CartItem.objects.get(id=item_id)
-    cart = cart_item.cart
-    cart_item.delete()
-    
-    # Update session cart count
-    total_items = sum(item.quantity for item in CartItem.objects.filter(cart=cart))
-    request.session['cart_items_count'] = total_items
-    
-    messages.warning(request, "Artikel entfernt.")
+    if change_quantity(request, item_id, 0):
+        messages.warning(request, "Artikel entfernt.")
     return redirect("cart")
 
 def checkout(request):
-    customer_id = request.session.get("customer_id")
-    if not customer_id:
+    if not request.customer:
         messages.error(request, "Bitte einloggen.")
         return redirect("login")
 
-    customer = Customer.objects.get(id=customer_id)
-    cart = Cart.objects.get(customer=customer)
-    cart_items = CartItem.objects.filter(cart=cart)
+    customer = request.customer
+    cart = request.cart
+    cart_items = CartItem.objects.filter(cart=cart).select_related("product")
 
     if not cart_items:
         messages.error(request, "Dein Warenkorb ist leer.")
@@ -96,62 +82,49 @@ def checkout(request):
     total_price = sum(item.total_price for item in cart_items)
 
     if request.method == "POST":
-        same_as_billing = request.POST.get("same_as_billing") == "on"
+        # Vor der Bestellung prüfen: der Wert landet ungeprüft in den Aufträgen des Workers
+        payment_method = request.POST.get("payment_method", "invoice")
+        if payment_method not in dict(Payment.PAYMENT_METHOD_CHOICES):
+            messages.error(request, "Ungültige Zahlungsart.")
+            return redirect("checkout")
 
-        # Rechnungsadresse 
-        billing_address, created = Address.objects.get_or_create(
-            customer=customer,
-            street=request.POST.get("billing_street"),
-            city=request.POST.get("billing_city"),
-            postal_code=request.POST.get("billing_postal_code"),
-            country=request.POST.get("billing_country", "Germany")
-        )
-
-        # Lieferadresse
-        if same_as_billing:
-            shipment_address = billing_address
-        else:
-            shipment_address, created = Address.objects.get_or_create(
-                customer=customer,
-                street=request.POST.get("shipping_street"),
-                city=request.POST.get("shipping_city"),
-                postal_code=request.POST.get("shipping_postal_code"),
-                country=request.POST.get("shipping_country", "Germany")
-            )
-
-        # Bestellung erstellen
-        order = Order.objects.create(
-            customer=customer,
-            status="pending",
-            billing_address=billing_address,
-            shipment_address=shipment_address
-        )
-
-        # OrderItems und Lagerbestand aktualisieren
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price_per_unit=item.product.price
-            )
-            item.product.stock -= item.quantity
-            item.product.save()
-
-        # Payment und Shipment erstellen
-        Payment.objects.create(
-            order=order,
-            amount=order.get_total_amount(),
-            payment_method=request.POST.get("payment_method", "invoice"),
-            status="pending"
-        )
-        
-        Shipment.objects.create(
-            order=order,
-            status="pending"
-        )
+        same_as_billing = request.POST.get("same_as_billing") == "on"
 
-        cart_items.delete()
+        # Adressen und Bestellung in einer Transaktion: scheitert die Bestellung, bleiben keine Adressen zurück
+        try:
+            with transaction.atomic():
+                # Rechnungsadresse
+                billing_address, created = Address.objects.get_or_create(
+                    customer=customer,
+                    street=request.POST.get("billing_street"),
+                    city=request.POST.get("billing_city"),
+                    postal_code=request.POST.get("billing_postal_code"),
+                    country=request.POST.get("billing_country", "Germany")
+                )
+
+                # Lieferadresse
+                if same_as_billing:
+                    shipment_address = billing_address
+                else:
+                    shipment_address, created = Address.objects.get_or_create(
+                        customer=customer,
+                        street=request.POST.get("shipping_street"),
+                        city=request.POST.get("shipping_city"),
+                        postal_code=request.POST.get("shipping_postal_code"),
+                        country=request.POST.get("shipping_country", "Germany")
+                    )
+
+                # Bestellung anlegen (Bestand gesperrt und geprüft)
+                order = place_order(
+                    customer,
+                    cart,
+                    billing_address=billing_address,
+                    shipment_address=shipment_address,
+                    payment_method=payment_method,
+                )
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return redirect("cart")
         
         # Reset cart count in session
         request.session['cart_items_count'] = 0
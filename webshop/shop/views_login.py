@@ -1,5 +1,6 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from .instrumentation import query_budget
 from .models import Customer, Address
 
 def register_view(request):
@@ -85,13 +86,13 @@ def logout_view(request):
     messages.info(request, "Du wurdest ausgeloggt.")
     return redirect("login")
 
+@query_budget(5, duplicates=0)
 def account_view(request):
-    customer_id = request.session.get("customer_id")
-    if not customer_id:
+    if not request.customer:
         messages.error(request, "Bitte logge dich ein.")
         return redirect("login")
     
-    customer = Customer.objects.get(id=customer_id)
+    customer = request.customer
     addresses = Address.objects.filter(customer=customer)
     
     return render(request, "account.html", {
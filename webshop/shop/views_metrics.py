@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .instrumentation import registry, render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    # Ohne Token nur in der Entwicklung erreichbar
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(registry.collect()), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,13 +1,71 @@
-from django.shortcuts import render
-from .models import Order, OrderItem, Customer
+from django.shortcuts import get_object_or_404, render, redirect
+from django.contrib import messages
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from . import invoices
+from .instrumentation import query_budget
+from .models import Order, OrderItem
+from .pagination import keyset_page
 
+ORDERS_PAGE_SIZE = 20
+
+# Rechnungsdateien ändern sich nie (Name = Inhalts-Hash); private: nur der Browser des Kunden cacht
+INVOICE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+@query_budget(4, duplicates=0)
 def orders_list(request):
-    customer_id = request.session.get("customer_id")
-    customer = Customer.objects.get(id=customer_id)
-    orders = Order.objects.filter(customer=customer).order_by("-order_date")
-    return render(request, "orders.html", {"orders": orders})
+    if not request.customer:
+        messages.error(request, "Bitte logge dich ein.")
+        return redirect("login")
+
+    # Summen stehen an der Bestellung, eine Abfrage pro Seite
+    orders = Order.objects.filter(customer_id=request.customer.id)
+    page = keyset_page(orders, "order_date", True, request.GET.get("cursor"), ORDERS_PAGE_SIZE)
+    return render(request, "orders.html", {
+        "orders": page,
+        "next_cursor": page.next_cursor,
+        "is_first_page": not request.GET.get("cursor"),
+    })
 
+@query_budget(5, duplicates=0)
 def order_detail(request, order_id):
-    order = Order.objects.get(id=order_id)
-    items = OrderItem.objects.filter(order=order)
+    # Beide Adressen per JOIN, das Template liest sie sonst einzeln nach
+    order = Order.objects.select_related("billing_address", "shipment_address").get(id=order_id)
+    items = OrderItem.objects.filter(order=order).select_related("product")
     return render(request, "order_detail.html", {"order": order, "items": items})
+
+
+def _own_order(request, order_id):
+    return get_object_or_404(Order.objects.only("id", "customer_id", "invoice"),
+                             id=order_id, customer_id=request.customer.id)
+
+@query_budget(8, duplicates=0)
+def order_invoice(request, order_id):
+    """Leitet auf die aktuelle Rechnungsdatei um, rendert sie nur, falls der Auftrag noch aussteht."""
+    if not request.customer:
+        messages.error(request, "Bitte logge dich ein.")
+        return redirect("login")
+
+    order = _own_order(request, order_id)
+    name = order.invoice.name or invoices.render_invoice(order.id)
+    response = redirect("order_invoice_file", order_id=order.id, digest=invoices.digest_from_name(name))
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+@query_budget(3, duplicates=0)
+def order_invoice_file(request, order_id, digest):
+    if not request.customer:
+        return redirect("login")
+
+    order = _own_order(request, order_id)
+    if not order.invoice or invoices.digest_from_name(order.invoice.name) != digest:
+        # Veraltete Adresse (Rechnung neu gerendert)
+        return redirect("order_invoice", order_id=order.id)
+
+    etag = f'"{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(order.invoice.storage.open(order.invoice.name), content_type="text/html; charset=utf-8")
+    response["ETag"] = etag
+    response["Cache-Control"] = INVOICE_CACHE_CONTROL
+    return response
@@ -1,6 +1,27 @@
+from django.http import Http404
 from django.shortcuts import render
+from .caching import shop_cache
+from .instrumentation import query_budget
 from .models import Product
+from .pagecache import cache_anonymous_page
+from .reservations import with_availability
 
+PRODUCT_CACHE_TIMEOUT = 60 * 60
+
+@query_budget(4, duplicates=0)
+@cache_anonymous_page("product")
 def product_detail(request, product_id):
-    product = Product.objects.get(id=product_id)
+    # Verfügbarkeit ändert sich laufend und wird live gelesen, der Rest kommt aus dem Cache
+    available = (
+        with_availability(Product.objects.filter(id=product_id))
+        .values_list("available", flat=True)
+        .first()
+    )
+    if available is None:
+        raise Http404("Produkt nicht gefunden.")
+
+    product = shop_cache.get_or_set(
+        "product", product_id, lambda: Product.objects.get(id=product_id), PRODUCT_CACHE_TIMEOUT
+    )
+    product.available = available
     return render(request, "product_detail.html", {"product": product})
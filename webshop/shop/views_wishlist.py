@@ -1,25 +1,25 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from .models import Wishlist, WishlistItem, Customer
+from .instrumentation import query_budget
+from .models import Wishlist, WishlistItem
 
+@query_budget(4, duplicates=0)
 def wishlist_view(request):
-    customer_id = request.session.get("customer_id")
-    if not customer_id:
+    if not request.customer:
         messages.error(request, "Bitte logge dich ein, um deine Wunschliste zu sehen.")
         return redirect("login")
     
-    customer = Customer.objects.get(id=customer_id)
+    customer = request.customer
     wishlist, _ = Wishlist.objects.get_or_create(customer=customer)
-    items = WishlistItem.objects.filter(wishlist=wishlist)
+    items = WishlistItem.objects.filter(wishlist=wishlist).select_related("product__category")
     return render(request, "wishlist.html", {"items": items})
 
 def wishlist_add(request, product_id):
-    customer_id = request.session.get("customer_id")
-    if not customer_id:
+    if not request.customer:
         messages.error(request, "Bitte logge dich ein, um Artikel zum Warenkorb hinzuzufügen.")
         return redirect("product_list")
 
-    customer = Customer.objects.get(id=customer_id)
+    customer = request.customer
     
     wishlist, _ = Wishlist.objects.get_or_create(customer=customer)
 
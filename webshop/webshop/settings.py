@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 """
@@ -43,11 +44,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Zuerst, damit Session- und Kundenabfragen mitgemessen werden
+    'shop.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.CustomerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +60,8 @@ ROOT_URLCONF = 'webshop.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates mit Messung der Renderzeit (shop/instrumentation.py)
+        'BACKEND': 'shop.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,12 +90,100 @@ DATABASES = {
          'PASSWORD': os.getenv('DATABASE_PASSWORD', 'dbpassword'),
          'HOST': os.getenv('DATABASE_HOST', '127.0.0.1'),
          'PORT': os.getenv('DATABASE_PORT', 5432),
-         'OPTIONS': {
-             'sslmode': 'disable',
-         },
+         # Verbindung über Requests hinweg wiederverwenden, vor der Wiederverwendung prüfen
+         'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', 60)),
+         'CONN_HEALTH_CHECKS': os.getenv('DATABASE_CONN_HEALTH_CHECKS', '1') == '1',
+         'OPTIONS': {},
     }
 }
 
+# sslmode gibt es nur bei PostgreSQL (lokal/Tests auch mit DATABASE_ENGINE=sqlite3)
+if 'postgresql' in DATABASES['default']['ENGINE']:
+    DATABASES['default']['OPTIONS']['sslmode'] = 'disable'
+
+    # Verbindungspool von psycopg 3 (psycopg[pool]) statt einer Verbindung pro Thread.
+    # Hilft vor allem unter ASGI, wo Django Verbindungen nicht über Requests hält.
+    # Schließt persistente Verbindungen aus, daher CONN_MAX_AGE = 0
+    if os.getenv('DATABASE_POOL', '0') == '1':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+        }
+
+
+# Cache
+# Mit REDIS_URL geteilt zwischen allen Workern, sonst lokal pro Prozess
+
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# {% cache %}-Fragmente (Produktkarten) bleiben im Prozess, ein Redis-Roundtrip
+# pro Karte wäre teurer als das Rendern
+CACHES['template_fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'template-fragments',
+    'OPTIONS': {'MAX_ENTRIES': 5000},
+}
+
+# Zweistufiger Shop-Cache (shop/caching.py)
+SHOP_CACHE = {
+    'ALIAS': 'default',
+    'LOCAL_MAX_ENTRIES': int(os.getenv("SHOP_CACHE_LOCAL_MAX_ENTRIES", 1024)),
+    'LOCAL_TTL': int(os.getenv("SHOP_CACHE_LOCAL_TTL", 5)),
+    'VERSION_TTL': int(os.getenv("SHOP_CACHE_VERSION_TTL", 2)),
+}
+
+
+# Seiten-Cache für anonyme Besucher (shop/pagecache.py); Verfügbarkeiten
+# können bis zu PAGE_CACHE_TIMEOUT Sekunden alt sein
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "1") == "1"
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", 30))
+
+# Katalog-API (/api/v1/products/, shop/views_api.py): Cache-Control max-age und
+# zugleich das Zeitfenster, in dem ETag und Verfügbarkeiten gleich bleiben
+CATALOG_API_MAX_AGE = int(os.getenv("CATALOG_API_MAX_AGE", 30))
+
+
+# Messung pro Request (shop/instrumentation.py): Server-Timing-Header (verrät
+# Abfragezahlen, daher standardmäßig nur mit DEBUG) und Prometheus-Endpunkt
+# /metrics/ (nur mit METRICS_TOKEN per "Authorization: Bearer" oder mit DEBUG)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1" if DEBUG else "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLISH_INTERVAL = int(os.getenv("METRICS_PUBLISH_INTERVAL", 10))
+
+# Query-Budgets der Views (@query_budget): unter "manage.py test" und mit DEBUG
+# schlägt eine Überschreitung fehl, sonst wird sie geloggt und gezählt
+TESTING = sys.argv[1:2] == ["test"]
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "1" if DEBUG or TESTING else "0") == "1"
+
+
+# Task-Queue (shop/tasks.py, Worker: manage.py run_tasks). Fehlgeschlagene
+# Aufträge warten TASK_RETRY_DELAY * 2^(Versuch-1) Sekunden; laufende, deren
+# Worker länger als TASK_LOCK_TIMEOUT still ist, werden neu eingestellt
+TASK_RETRY_DELAY = int(os.getenv("TASK_RETRY_DELAY", 10))
+TASK_LOCK_TIMEOUT = int(os.getenv("TASK_LOCK_TIMEOUT", 300))
+TASK_WORKER_CONCURRENCY = int(os.getenv("TASK_WORKER_CONCURRENCY", 4))
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", 5))
+
+# Bestellbestätigungen und Bestandswarnungen; ohne Mailserver in die Konsole
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "shop@example.com")
+ADMINS = [("Shop", email) for email in os.getenv("DJANGO_ADMINS", "").split(",") if email]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,6 +222,26 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Produktion: Dateinamen mit Inhalts-Hash plus .gz/.br-Varianten aus collectstatic.
+# Braucht ein collectstatic vor dem Start, daher nur per STATIC_MANIFEST=1
+STATIC_MANIFEST = os.getenv("STATIC_MANIFEST", "0") == "1"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # Rechnungen (shop/invoices.py), nicht öffentlich unter INVOICE_ROOT
+    "invoices": {"BACKEND": "shop.storage.InvoiceStorage"},
+    "staticfiles": {
+        "BACKEND": "shop.storage.CompressedManifestStaticFilesStorage"
+        if STATIC_MANIFEST
+        else "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
+# Statische Dateien und Medien direkt in der WSGI-Schicht ausliefern (shop/static_wsgi.py).
+# Gehashte Dateien sind immutable, sonst gilt max-age mit ETag-Revalidierung
+SERVE_STATIC = os.getenv("SERVE_STATIC", "1") == "1"
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", 60 * 60))
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", 7 * 24 * 60 * 60))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -136,3 +249,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Nicht unterhalb von MEDIA_ROOT oder STATIC_ROOT ablegen, sonst sind Rechnungen öffentlich
+INVOICE_ROOT = os.getenv("INVOICE_ROOT", os.path.join(BASE_DIR, 'private'))
+
+# Async-Varianten der lesenden Views (shop/views_async.py), sinnvoll nur unter ASGI
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+
+# Haltezeit für Lagerreservierungen im Warenkorb (Sekunden)
+STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", 15 * 60))
+
+# Kundenauflösung pro Request (shop/middleware.py)
+CUSTOMER_SELECT_RELATED = ("default_billing_address", "default_shipping_address")
+CUSTOMER_CACHE_TTL = int(os.getenv("CUSTOMER_CACHE_TTL", 30))